@@ -0,0 +1,361 @@
+"""Benchmarks for the game engine, state encoders, and agent update paths.
+
+Every benchmark uses fixed seeds, so two runs on the same machine do the same work. Results are printed as a table and
+written as JSON which a later run can be compared against with `--compare`:
+
+    python benchmarks/bench.py --output before.json
+    python benchmarks/bench.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'snake_ai'))
+
+import core  # noqa: E402
+import features  # noqa: E402
+import policy  # noqa: E402
+
+SEED = 1234
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default=None, dest='output', help='Write results to this JSON file.')
+    parser.add_argument('--compare', default=None, dest='compare', help='Compare against results from an earlier run.')
+    parser.add_argument('--threshold', default=1.25, type=float, dest='threshold',
+                        help='Slowdown in median latency, relative to --compare, counted as a regression.')
+    parser.add_argument('--calls', default=2000, type=int, dest='calls', help='Timed calls per benchmark.')
+    parser.add_argument('--filter', default='', dest='filter',
+                        help='Only run the groups (engine, features, food, batch, render, policy, agent) containing '
+                             'this.')
+
+    return parser.parse_args(args)
+
+
+def hamiltonian_cycle(size):
+    """Directions around a cycle visiting every interior cell of a board with walls at 0 and `size`. The number of
+    interior cells along each side must be even. The cycle starts at (1, 1) heading right."""
+    n = size - 1
+    moves = [core.RIGHT] * (n - 1) + [core.DOWN]
+    for row in range(2, n + 1):
+        moves += [core.LEFT if row % 2 == 0 else core.RIGHT] * (n - 2)
+        moves += [core.DOWN] if row < n else [core.LEFT]
+    moves += [core.UP] * (n - 1)
+    return [core.direction_index(move) for move in moves]
+
+
+def cycling_game(size, length, legacy_rng=False):
+    """Build a game whose snake of the given length follows a Hamiltonian cycle, so that it never dies.
+
+    :returns the game along with an endless iterator over the moves that keep it alive."""
+    cycle = hamiltonian_cycle(size)
+    # The snake is laid along the first `length` cells of the cycle with nothing left to digest, so that it only grows
+    # by eating while being timed.
+    positions = [np.array([1, 1])]
+    for move in cycle[:length - 1]:
+        positions.append(positions[-1] + core.DIRECTIONS[move])
+    snake = core.Snake.from_parts(positions[::-1], [False] * length, cycle[length - 2] if length > 1 else core.RIGHT)
+    assert len(snake) == length
+
+    state = core.GameState(snake, size, size, seed=SEED, legacy_rng=legacy_rng)
+
+    def moves():
+        i = length - 1
+        while True:
+            yield cycle[i % len(cycle)]
+            i += 1
+
+    return state, moves()
+
+
+def measure(name, params, call, calls, setup=None):
+    """Time `calls` invocations of `call` individually.
+
+    :returns a dictionary summarising the timings."""
+    timings = np.empty(calls)
+    for i in range(calls):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        call()
+        timings[i] = time.perf_counter() - start
+
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99]) * 1e6
+    return {
+        'name': name,
+        'params': params,
+        'calls': calls,
+        'per_sec': calls / timings.sum(),
+        'mean_us': timings.mean() * 1e6,
+        'p50_us': p50,
+        'p90_us': p90,
+        'p99_us': p99,
+    }
+
+
+def bench_engine(calls):
+    results = []
+    for size in (11, 21, 41):
+        interior = (size - 1) ** 2
+        for fraction in (0, 0.5, 0.9):
+            length = max(1, int(interior * fraction))
+            params = {'size': size, 'length': length}
+
+            game = list(cycling_game(size, length))
+
+            def restart():
+                # Eating grows the snake until it fills the board, so start over once the game has been won.
+                if not game[0].is_playable():
+                    game[:] = cycling_game(size, length)
+
+            def update():
+                game[0].update(next(game[1]))
+
+            results.append(measure('update', params, update, calls, setup=restart))
+            results.append(measure('to_matrix', params, lambda: game[0].to_matrix(), calls))
+            results.append(measure('to_matrix_readonly', params, lambda: game[0].to_matrix(readonly=True), calls))
+            results.append(measure('get_primitive_state_vector', params, lambda: game[0].get_primitive_state_vector(),
+                                   calls))
+
+    return results
+
+
+def bench_features(calls):
+    results = []
+    for size in (11, 41):
+        length = (size - 1) ** 2 // 2
+        params = {'size': size, 'length': length}
+        state, _ = cycling_game(size, length)
+        row = np.empty(8, dtype=np.float32)
+
+        results.append(measure('get_primitive_state_vector', params, state.get_primitive_state_vector, calls))
+        results.append(measure('primitive_vector', params, lambda: features.primitive_vector(state, out=row), calls))
+        results.append(measure('encode_all', params, lambda: features.encode(state, list(features.ENCODERS)), calls))
+
+    for count in (64, 1024):
+        params = {'size': 21, 'games': count}
+        batch = core.BatchGameState(count, 21, 21, (10, 10), 4, core.LEFT, seeds=np.arange(count))
+        out = np.empty((count, 8), dtype=np.float32)
+        result = measure('encode_batch_primitive', params, lambda: features.encode(batch, out=out), max(1, calls // 10))
+        result['games_per_sec'] = result['per_sec'] * count
+        results.append(result)
+
+    return results
+
+
+def bench_food(calls):
+    results = []
+    for size in (11, 21):
+        interior = (size - 1) ** 2
+        for legacy_rng in (False, True):
+            length = interior - 2
+            params = {'size': size, 'length': length, 'legacy_rng': legacy_rng}
+            state, _ = cycling_game(size, length, legacy_rng)
+
+            def clear():
+                state.food_items = []
+
+            results.append(measure('update_food_nearly_full', params, state._update_food, calls, setup=clear))
+
+    return results
+
+
+def bench_batch(calls):
+    results = []
+    for count in (64, 1024):
+        params = {'size': 21, 'games': count}
+        rng = np.random.RandomState(SEED)
+        batch = core.BatchGameState(count, 21, 21, (10, 10), 4, core.LEFT, seeds=np.arange(count))
+        facing = np.full(count, core.direction_index(core.LEFT))
+
+        def step():
+            # Turn at random, never reversing, and restart once most games have ended.
+            nonlocal batch
+            turns = rng.randint(-1, 2, size=count)
+            facing[:] = (facing + turns) % 4
+            batch.step(facing)
+            if batch.is_playable().sum() < count // 4:
+                batch = core.BatchGameState(count, 21, 21, (10, 10), 4, core.LEFT, seeds=np.arange(count))
+                facing[:] = core.direction_index(core.LEFT)
+
+        result = measure('batch_step', params, step, max(1, calls // 10))
+        result['games_per_sec'] = result['per_sec'] * count
+        results.append(result)
+
+    return results
+
+
+def bench_render(calls):
+    """Drawing with PygameRenderer into an offscreen window, both after every move and when nothing has changed."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        import render
+    except ImportError as e:
+        print('Skipping render benchmarks: %s' % e)
+        return []
+
+    results = []
+    for size in (20, 40):
+        length = (size - 1) ** 2 // 2
+        params = {'size': size, 'length': length}
+        renderer = render.PygameRenderer(size, size, 10)
+        game = list(cycling_game(size, length))
+
+        def restart():
+            if not game[0].is_playable():
+                game[:] = cycling_game(size, length)
+
+        def move_and_render():
+            game[0].update(next(game[1]))
+            renderer.render(game[0])
+
+        results.append(measure('render_after_move', params, move_and_render, calls, setup=restart))
+        results.append(measure('render_unchanged', params, lambda: renderer.render(game[0]), calls))
+
+        def full():
+            renderer.clear()
+            renderer.render(game[0])
+
+        results.append(measure('render_full', params, full, max(1, calls // 10)))
+        renderer.close()
+
+    return results
+
+
+def bench_policy(calls):
+    """Inference through NumpyPolicy on a network shaped like DefaultAgent's, which needs no TensorFlow."""
+    rng = np.random.RandomState(SEED)
+    sizes = [8, 120, 120, 120, 3]
+    weights = []
+    for n_in, n_out in zip(sizes, sizes[1:]):
+        weights += [rng.normal(scale=np.sqrt(1 / n_in), size=(n_in, n_out)), np.zeros(n_out)]
+    net = policy.NumpyPolicy(weights)
+
+    results = []
+    for batch in (1, 256):
+        states = rng.randint(2, size=(batch, 8))
+        results.append(measure('policy_act', {'batch': batch}, lambda: net.act(states), calls))
+        results.append(measure('policy_predict', {'batch': batch}, lambda: net.predict(states), calls))
+
+    agent = policy.PolicyAgent(weights, epsilon=0.1)
+    states = rng.randint(2, size=(64, 1, 8))
+    results.append(measure('make_choice_loop', {'batch': 64}, lambda: [agent.make_choice(s) for s in states],
+                           max(1, calls // 10)))
+    results.append(measure('make_choices', {'batch': 64}, lambda: agent.make_choices(states), max(1, calls // 10)))
+
+    results.append(measure('policy_set_weights', {}, lambda: net.set_weights(weights), max(1, calls // 10)))
+    return results
+
+
+def bench_agent(calls):
+    import ai
+
+    np.random.seed(SEED)
+    try:
+        agent = ai.DefaultAgent((8,), epsilon=0, gamma=0.95)
+    except ImportError as e:
+        print('Skipping agent benchmarks: %s' % e)
+        return []
+
+    results = []
+    rng = np.random.RandomState(SEED)
+    states = rng.randint(2, size=(calls + 1, 8)).reshape(-1, 1, 8)
+
+    results.append(measure('make_choice', {}, lambda: agent.make_choice(states[0]), calls))
+
+    def short_memory():
+        agent.train_short_memory(states[0], 1, 1.0, states[1], False)
+
+    results.append(measure('train_short_memory', {}, short_memory, max(1, calls // 10)))
+
+    for i in range(len(states) - 1):
+        agent.remember(states[i], i % 3, float(i % 5), states[i + 1], i % 7 == 0)
+    agent.epsilon = 0
+    results.append(measure('replay_new', {'memory': len(states) - 1}, agent.replay_new, 5))
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def key(result):
+    return result['name'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """Print the change in median latency against a baseline.
+
+    :returns the number of benchmarks which slowed down by more than `threshold`."""
+    previous = {key(result): result for result in baseline['results']}
+    regressions = 0
+    print()
+    print('%-60s %12s %12s %8s' % ('benchmark', 'before us', 'after us', 'ratio'))
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        ratio = result['p50_us'] / old['p50_us']
+        flag = ''
+        if ratio > threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        print('%-60s %12.1f %12.1f %8.2f%s' % (key(result), old['p50_us'], result['p50_us'], ratio, flag))
+
+    return regressions
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    results = []
+    for bench in (bench_engine, bench_features, bench_food, bench_batch, bench_render, bench_policy, bench_agent):
+        if args.filter and args.filter not in bench.__name__:
+            continue
+        results += bench(args.calls)
+
+    print('%-60s %12s %10s %10s %10s' % ('benchmark', 'calls/s', 'p50 us', 'p90 us', 'p99 us'))
+    for result in results:
+        print('%-60s %12.0f %10.1f %10.1f %10.1f' % (key(result), result['per_sec'], result['p50_us'],
+                                                     result['p90_us'], result['p99_us']))
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'seed': SEED,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print('%d benchmark(s) regressed.' % regressions)
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
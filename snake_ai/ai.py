@@ -1,11 +1,11 @@
-import random
+import json
+import os
 from abc import ABC, abstractmethod
-from collections import deque
 
 import numpy as np
-from keras.layers.core import Dense, Dropout
-from keras.models import Sequential
-from keras.optimizers import Adam
+
+from memory import PrioritizedReplayBuffer, ReplayBuffer
+from policy import NumpyPolicy, epsilon_greedy, load_weights, save_weights
 
 
 class Agent(ABC):
@@ -18,6 +18,16 @@ class Agent(ABC):
         :returns an integer 0-3 corresponding to a directional input UP, DOWN, LEFT, or RIGHT."""
         pass
 
+    @abstractmethod
+    def make_choices(self, game_states):
+        """Determines a choice for each of a batch of game states, such as those of several games played side by side.
+
+        Arguments:
+        game_states: an array with one state per row.
+
+        :returns an array holding one choice per state, as make_choice would return."""
+        pass
+
     @abstractmethod
     def dump_weights(self):
         """Output a list of weights that affect the decision making process."""
@@ -40,6 +50,9 @@ class RandomAgent(Agent):
     def make_choice(self, game_state):
         return np.random.randint(4)
 
+    def make_choices(self, game_states):
+        return np.random.randint(4, size=len(game_states))
+
     def dump_weights(self):
         pass
 
@@ -52,51 +65,190 @@ class RandomAgent(Agent):
 
 # TODO(matthew-c21) - Finish implementing this model.
 class DefaultAgent(Agent):
-    def __init__(self, input_dim, learning_rate=0.0005, epsilon=1.0, gamma=0, weights=None):
+    def __init__(self, input_dim, learning_rate=0.0005, epsilon=1.0, gamma=0, weights=None, memory_size=5000,
+                 prioritized=False, target_update=None, tau=None, double=False):
+        """Arguments:
+        input_dim: the shape of a single state.
+        learning_rate, epsilon, gamma: the usual DQN hyper-parameters.
+        weights: path to weights for the model to start from, either a .npz file written by `policy.save_weights` or
+            any file Keras can load.
+        memory_size: the number of transitions kept for replay.
+        prioritized: whether to replay transitions in proportion to their TD error.
+        target_update: if given, bootstrap from a frozen target network copied from the model every this many fits.
+        tau: if given, bootstrap from a target network moved this fraction of the way towards the model after every
+            fit instead.
+        double: pick the best next action with the model but value it with the target network, as in double DQN.
+            Requires a target network."""
+        if double and target_update is None and tau is None:
+            raise ValueError('Double DQN requires a target network, given by target_update or tau')
+
         self.input_dim = input_dim
         self.learning_rate = learning_rate
         self.epsilon = epsilon
         self.epsilon_decay = 0.95
         self.min_epsilon = 0.01
         self.gamma = gamma
-        self.memory = deque(maxlen=5000)
+        # Prioritized replay favours transitions with large TD errors over the many uneventful moves.
+        self.memory = (PrioritizedReplayBuffer if prioritized else ReplayBuffer)(memory_size, input_dim)
         self.short_memory = np.array([])
         self.model = DefaultAgent._network(learning_rate, input_dim, weights=weights)
+        # Moves are chosen with a NumPy copy of the weights, refreshed the next time a move is needed after fitting.
+        self.policy = NumpyPolicy(self.dump_weights())
+        self._policy_stale = False
+        # The target network is only ever evaluated, so it lives in NumPy alone.
+        self.target_update = target_update
+        self.tau = tau
+        self.double = double
+        self.target = None if target_update is None and tau is None else NumpyPolicy(self.dump_weights())
+        # Running totals of calls into the model, used to report how much of training is spent in Keras.
+        self.predict_calls = 0
+        self.fit_calls = 0
 
     def make_choice(self, game_state):
         # TODO(matthew-c21): Determine if more configuration needed.
         if np.random.rand() < self.epsilon:
             return np.random.randint(3)
-        prediction = self.model.predict(game_state)
-        return np.argmax(prediction[0])
+        return self.sync_policy().act(game_state)[0]
+
+    def make_choices(self, game_states):
+        return epsilon_greedy(self.sync_policy(), game_states, self.epsilon)
 
     def dump_weights(self):
         return self.model.get_weights()
 
+    def set_weights(self, weights):
+        self.model.set_weights(weights)
+        self._policy_stale = True
+        if self.target is not None:
+            self.target.set_weights(weights)
+
+    def sync_policy(self):
+        """Bring the NumPy copy of the network up to date with the model if it has been trained since the last sync.
+
+        :returns the policy."""
+        if self._policy_stale:
+            self.policy.set_weights(self.dump_weights())
+            self._policy_stale = False
+        return self.policy
+
+    def save(self, directory, memory=False, **meta):
+        """Write a checkpoint from which `restore` can resume training.
+
+        The directory holds the model weights in weights.npz, the optimizer state in optimizer.npz, the target network
+        in target.npz if there is one, and epsilon along with `meta` in agent.json. The replay memory is written to
+        the memory subdirectory if `memory` is set.
+
+        Arguments:
+        directory: where to write the checkpoint.
+        memory: whether to include the replay memory.
+        meta: further JSON serializable values to store, such as the number of games played."""
+        os.makedirs(directory, exist_ok=True)
+        save_weights(os.path.join(directory, 'weights.npz'), self.dump_weights())
+        save_weights(os.path.join(directory, 'optimizer.npz'), self.model.optimizer.get_weights())
+        if self.target is not None:
+            save_weights(os.path.join(directory, 'target.npz'), self.target.get_weights())
+        if memory:
+            self.memory.save(os.path.join(directory, 'memory'))
+
+        with open(os.path.join(directory, 'agent.json'), 'w') as f:
+            json.dump(dict(meta, epsilon=self.epsilon, fit_calls=self.fit_calls), f)
+
+    def restore(self, directory):
+        """Load a checkpoint written by `save`.
+
+        :returns the `meta` values passed to `save`."""
+        with open(os.path.join(directory, 'agent.json')) as f:
+            meta = json.load(f)
+        self.epsilon = meta.pop('epsilon')
+        self.fit_calls = meta.pop('fit_calls')
+
+        self.set_weights(load_weights(os.path.join(directory, 'weights.npz')))
+        if self.target is not None and os.path.exists(os.path.join(directory, 'target.npz')):
+            self.target.set_weights(load_weights(os.path.join(directory, 'target.npz')))
+
+        optimizer = load_weights(os.path.join(directory, 'optimizer.npz'))
+        if optimizer:
+            if not self.model.optimizer.get_weights():
+                # Keras only creates the optimizer's slots on the first update, so make one which changes nothing.
+                zeros = np.zeros((1,) + tuple(self.input_dim))
+                self.model.train_on_batch(zeros, np.zeros((1, 3)), sample_weight=np.zeros(1))
+            self.model.optimizer.set_weights(optimizer)
+
+        if os.path.exists(os.path.join(directory, 'memory')):
+            self.memory = type(self.memory).load(os.path.join(directory, 'memory'))
+        return meta
+
     def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
 
     def train_short_memory(self, state, action, reward, next_state, done):
         target = reward
         if not done:
-            target = reward + self.gamma * np.amax(self.model.predict(next_state)[0])
+            target = reward + self.gamma * self._next_values(next_state)[0]
 
-        target_f = self.model.predict(state)
+        target_f = self._predict(state)
         target_f[0][action] = target
-        self.model.fit(state, target_f, epochs=1, verbose=0)
+        self._fit(state, target_f)
 
     def replay_new(self, max_sample=1000):
         """Retrain the model based on a sampling of its own memory."""
-        batch = self.memory if len(self.memory) < max_sample else random.sample(self.memory, max_sample)
-
-        for entry in batch:
-            self.train_short_memory(*entry)
+        if len(self.memory):
+            indices, weights = self.memory.sample_with_weights(max_sample)
+            errors = self._train_batch(*self.memory.get(indices), weights=weights)
+            self.memory.update_priorities(indices, errors)
 
         if self.epsilon_decay > self.min_epsilon:
             self.epsilon *= self.epsilon_decay
 
+    def _train_batch(self, states, actions, rewards, next_states, done, weights=None):
+        """Same update as train_short_memory, applied to a whole batch of transitions with one forward pass over the
+        next states, one over the current states, and a single call to fit.
+
+        :returns the TD error of each transition before fitting."""
+        targets = rewards + np.where(done, 0, self.gamma * self._next_values(next_states))
+
+        target_f = self._predict(states)
+        rows = np.arange(len(actions))
+        errors = targets - target_f[rows, actions]
+        target_f[rows, actions] = targets
+        self._fit(states, target_f, sample_weight=weights)
+        return errors
+
+    def _next_values(self, next_states):
+        """:returns the value bootstrapped from each of the given states when computing targets."""
+        if self.target is None:
+            return np.amax(self._predict(next_states), axis=1)
+
+        values = self.target.predict(next_states)
+        if self.double:
+            actions = self.sync_policy().act(next_states)
+            return values[np.arange(len(actions)), actions]
+        return values.max(axis=1)
+
+    def _update_target(self):
+        if self.tau is not None:
+            self.target.blend(self.dump_weights(), self.tau)
+        elif self.fit_calls % self.target_update == 0:
+            self.target.set_weights(self.dump_weights())
+
+    def _predict(self, states):
+        self.predict_calls += 1
+        return self.model.predict(states)
+
+    def _fit(self, states, targets, sample_weight=None):
+        self.fit_calls += 1
+        self.model.fit(states, targets, epochs=1, verbose=0, sample_weight=sample_weight)
+        self._policy_stale = True
+        if self.target is not None:
+            self._update_target()
+
     @staticmethod
     def _network(learning_rate, input_dim, output_dim=120, weights=None):
+        # Keras is only loaded once a network is built, so that the rest of this module can be used without it.
+        from keras.layers.core import Dense, Dropout  # noqa: F401
+        from keras.models import Sequential
+        from keras.optimizers import Adam
+
         # Shamelessly stolen from https://github.com/maurock/snake-ga/blob/master/DQN.py.
         # TODO(matthew-c21): Determine how output_dim affects model.
         model = Sequential()
@@ -111,5 +263,8 @@ class DefaultAgent(Agent):
         model.compile(loss='mse', optimizer=opt)
 
         if weights:
-            model.load_weights(weights)
+            if str(weights).endswith('.npz'):
+                model.set_weights(load_weights(weights))
+            else:
+                model.load_weights(weights)
         return model
@@ -1,5 +1,7 @@
 """Contains main game logic."""
-from collections import deque, namedtuple
+import copy
+from collections import Counter, deque, namedtuple
+from itertools import islice
 
 import numpy as np
 
@@ -8,12 +10,67 @@ DOWN = -UP
 LEFT = np.array([-1, 0])
 RIGHT = -LEFT
 
+# Directions are numbered clockwise so that reversing a direction adds 2 modulo 4.
+DIRECTIONS = (UP, RIGHT, DOWN, LEFT)
+_DIRECTION_INDEX = {(int(x), int(y)): i for i, (x, y) in enumerate(DIRECTIONS)}
+_DIRECTION_ARRAY = np.array(DIRECTIONS)
+# Indices into DIRECTIONS of each (x, y) unit vector, looked up at (x + 1) * 3 + y + 1. Zero vectors map to -1.
+_VECTOR_INDEX = np.full(9, -1)
+_VECTOR_INDEX[(_DIRECTION_ARRAY[:, 0] + 1) * 3 + _DIRECTION_ARRAY[:, 1] + 1] = np.arange(4)
+
+# Turns relative to the direction faced, as offsets in DIRECTIONS: straight, left, and right. These are the relative
+# moves an agent chooses between.
+TURNS = (0, 3, 1)
+
+# Positions are packed into single integers as (y + _OFFSET) * _STRIDE + (x + _OFFSET). The offset keeps cells just
+# beyond the upper and left walls non-negative.
+_STRIDE = 1 << 16
+_OFFSET = 1 << 8
+_OFFSETS = tuple(int(y) * _STRIDE + int(x) for x, y in DIRECTIONS)
+
+# Number of random draws made when placing food before falling back to the index of free cells.
+_FOOD_ATTEMPTS = 8
+
 # Helper class to clarify each segment of a snake.
 _snake_part = namedtuple('snake_part', ['pos', 'has_eaten'])
 _food_item = namedtuple('food_item', ['pos', 'value'])
 
 
+def direction_index(direction):
+    """Convert UP, RIGHT, DOWN, or LEFT to its index in DIRECTIONS. Integers are assumed to already be indices."""
+    if isinstance(direction, (int, np.integer)):
+        return int(direction)
+
+    x, y = direction
+    try:
+        return _DIRECTION_INDEX[int(x), int(y)]
+    except KeyError:
+        raise ValueError('Not a direction: ' + str(direction))
+
+
+def _vector_indices(vectors):
+    """:returns the index in DIRECTIONS of each row of an array of unit vectors, or -1 for zero vectors."""
+    return _VECTOR_INDEX[(vectors[..., 0] + 1) * 3 + vectors[..., 1] + 1]
+
+
+def _random_seed():
+    """Draw a seed from fresh OS entropy without touching the global NumPy random state."""
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def _pack(position):
+    x, y = position
+    return (int(y) + _OFFSET) * _STRIDE + int(x) + _OFFSET
+
+
+def _unpack(cell):
+    y, x = divmod(cell, _STRIDE)
+    return np.array([x - _OFFSET, y - _OFFSET])
+
+
 class Snake:
+    __slots__ = ['_cells', '_eaten', '_direction', '_occupied', 'moves']
+
     def __init__(self, start_pos, init_length, facing):
         """Generate a new snake according to the given specifications. The tail of the snake will be
         generated in a straight line behind the head.
@@ -23,21 +80,58 @@ class Snake:
         init_length: scalar quantity representing the length of the snake including the head.
         facing: UP, DOWN, LEFT, or RIGHT in this package."""
 
-        self.body = deque()  # The tail is stored at the head of the queue.
-        self.facing = facing
+        # Segments are stored as packed cells, with the head at the front of the queue.
+        self._cells = deque()
+        self._eaten = deque()
+        self._direction = direction_index(facing)
+        # Number of segments on each occupied cell.
+        self._occupied = Counter()
+        self.moves = 0
+
+        head = _pack(start_pos)
         for i in range(init_length):
-            self.body.append(_snake_part(start_pos - i * facing, False))
+            cell = head - i * _OFFSETS[self._direction]
+            self._cells.append(cell)
+            self._eaten.append(False)
+            self._occupied[cell] += 1
+
+    @classmethod
+    def from_parts(cls, positions, eaten, facing):
+        """Build a snake with arbitrary segments, such as one read back from a recording.
+
+        Arguments:
+        positions: the position of each segment, from the head to the tail.
+        eaten: whether each segment holds food which has not yet been digested.
+        facing: UP, DOWN, LEFT, or RIGHT, or its index in DIRECTIONS."""
+        snake = cls(positions[0], 1, facing)
+        snake._cells = deque(_pack(position) for position in positions)
+        snake._eaten = deque(bool(e) for e in eaten)
+        snake._occupied = Counter(snake._cells)
+        return snake
 
     def __iter__(self):
         """Return an iterator that begins at the head of the snake and moves to the tail.
 
-        Each value yielded is a named tuple in the form (position, direction), with both values
-        being two-value vectors represented by np.ndarray."""
-        return iter(self.body)
+        Each value yielded is a named tuple in the form (position, has_eaten), with the position being a two-value
+        vector represented by np.ndarray."""
+        return (_snake_part(_unpack(cell), eaten) for cell, eaten in zip(self._cells, self._eaten))
 
     def __str__(self):
         return '\n'.join([str(part) for part in self])
 
+    @property
+    def facing(self):
+        return DIRECTIONS[self._direction]
+
+    @facing.setter
+    def facing(self, direction):
+        self._direction = direction_index(direction)
+
+    @property
+    def direction(self):
+        """The index in DIRECTIONS of the direction faced."""
+        return self._direction
+
     def move(self, direction, has_eaten=False):
         """Cause the snake to change it's direction, adjusting the rest of the body forward.
 
@@ -46,37 +140,100 @@ class Snake:
         continue to move right.
 
         Arguments:
-        direction: one of UP, DOWN, LEFT, or RIGHT. The new direction for the head of the snake to
-            face.
+        direction: one of UP, DOWN, LEFT, or RIGHT, or its index in DIRECTIONS. The new direction for the head of the
+            snake to face.
         should_extend: boolean determining whether or not the snake should grow due to the tile it
-        has traversed."""
-        self.facing = self.fix_dir(direction)
+        has traversed.
 
-        self.body.appendleft(_snake_part(self.head().pos + self.facing, has_eaten))
+        :returns the packed cell vacated by the tail, or None if the snake grew."""
+        self.moves += 1
+        self._direction = self.fix_index(direction_index(direction))
 
-        if not self.body[-1].has_eaten:
-            self.body.pop()
-        else:
-            self.body[-1] = _snake_part(self.body[-1].pos, False)
+        head = self._cells[0] + _OFFSETS[self._direction]
+        self._cells.appendleft(head)
+        self._eaten.appendleft(has_eaten)
+        self._occupied[head] += 1
+
+        if not self._eaten[-1]:
+            tail = self._cells.pop()
+            self._eaten.pop()
+            self._occupied[tail] -= 1
+            if not self._occupied[tail]:
+                del self._occupied[tail]
+            return tail
+
+        self._eaten[-1] = False
+        return None
 
     def intersects(self, position, start_pos=0):
-        """Helper method to determine if a position makes contact with this snake."""
-        for part in list(self)[start_pos:]:
-            if (part.pos == position).all():
-                return True
+        """Helper method to determine if a position makes contact with this snake.
 
-        return False
+        Runs in constant time for the default `start_pos`. Segments before `start_pos` are excluded, so passing 1
+        ignores the head."""
+        return self._intersects_cell(_pack(position), start_pos)
+
+    def _intersects_cell(self, cell, start_pos=0):
+        count = self._occupied.get(cell, 0)
+        for part in islice(self._cells, start_pos):
+            if part == cell:
+                count -= 1
+
+        return count > 0
 
     def head(self):
-        return self.body[0]
+        return _snake_part(_unpack(self._cells[0]), self._eaten[0])
+
+    def head_cell(self):
+        """:returns the packed position of the head."""
+        return self._cells[0]
+
+    def head_position(self):
+        """:returns the (x, y) position of the head as a tuple of ints, without building a snake part."""
+        y, x = divmod(self._cells[0], _STRIDE)
+        return x - _OFFSET, y - _OFFSET
 
     def __len__(self):
-        return len(self.body)
+        return len(self._cells)
 
     def fix_dir(self, direction):
-        if (direction + self.facing == np.zeros(2)).all():
-            return self.facing
-        return direction
+        return DIRECTIONS[self.fix_index(direction_index(direction))]
+
+    def fix_index(self, index):
+        """Same as fix_dir, but taking and returning an index into DIRECTIONS."""
+        if index == (self._direction + 2) % 4:
+            return self._direction
+        return index
+
+
+class _FreeCells:
+    """Unordered set of cells supporting constant time insertion, removal, and indexing.
+
+    Removal swaps the last cell into the vacated slot, so the order of the cells depends only on the sequence of
+    insertions and removals."""
+
+    def __init__(self, cells):
+        self.cells = list(cells)
+        self.slots = {cell: i for i, cell in enumerate(self.cells)}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __getitem__(self, i):
+        return self.cells[i]
+
+    def __contains__(self, cell):
+        return cell in self.slots
+
+    def add(self, cell):
+        self.slots[cell] = len(self.cells)
+        self.cells.append(cell)
+
+    def remove(self, cell):
+        slot = self.slots.pop(cell)
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[slot] = last
+            self.slots[last] = slot
 
 
 # TODO(matthew-c21) - Extract an abstract class to simplify later board designs.
@@ -85,7 +242,21 @@ class GameState:
 
     No internal walls, outer perimeter acts as border, only one food item on screen at a time."""
 
-    def __init__(self, snake, length, width, food_max=1, seed=None, max_drought=np.Inf):
+    def __init__(self, snake, length, width, food_max=1, seed=None, max_drought=np.Inf, legacy_rng=False,
+                 recorder=None):
+        """Create a board around the given snake and place its first food items.
+
+        Arguments:
+        snake: the Snake playing on this board.
+        length, width: board dimensions. The walls lie on rows 0 and `length` and columns 0 and `width`.
+        food_max: the number of food items kept on the board.
+        seed: seed for food placement. One is drawn at random when omitted.
+        max_drought: the number of turns the snake may go without eating.
+        legacy_rng: derive food placement from a seed which changes with every move, as older versions did, instead of
+            a Generator owned by this game. The two place food differently for the same seed. Legacy placement matches
+            older versions as long as one of the first _FOOD_ATTEMPTS random draws lands on a free cell, after which it
+            draws from the free cells instead of drawing again.
+        recorder: a recording.GameRecorder to which the game is written as it is played."""
         self.length = length
         self.width = width
         self.snake = snake
@@ -95,10 +266,25 @@ class GameState:
         self.max_drought = max_drought
         self.turn_count = 0
         self.state_flag = True
+        self.won = False
         self.prev_move = None
-        self.seed = seed if seed is not None else np.random.randint(2 ** 32)  # Hardcoded value for maximum seed.
+        self.seed = seed if seed is not None else _random_seed()
+        self.legacy_rng = legacy_rng
+        self.rng = None if legacy_rng else np.random.default_rng(self.seed)
+        self._free_cells = None
+        self._synced_moves = None
+        # Observation buffer returned by to_matrix, along with the number of snake moves it reflects.
+        self._matrix = None
+        self._matrix_moves = None
+        # Number of calls to update or set_food so far, and the cells the last of them changed.
+        self.updates = 0
+        self._changed = None
         self._update_food()
 
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.begin(self)
+
     # TODO(matthew-c21): Have the board generate it's own snake given a relative size and initial facing direction.
     def update(self, direction):
         """Updates the game state in accordance with the given move. If the game is not in a playable state, no changes
@@ -112,21 +298,36 @@ class GameState:
 
         has_eaten = False
 
-        updated_pos = self.snake.fix_dir(direction) + self.snake.head().pos
-        self.prev_move = self.snake.fix_dir(direction)
+        index = direction_index(direction)
+        if self.recorder is not None:
+            self.recorder.move(index)
+        move = self.snake.fix_index(index)
+        updated_cell = self.snake.head_cell() + _OFFSETS[move]
+        self.prev_move = DIRECTIONS[move]
 
         for food in self.food_items:
-            if (food.pos == updated_pos).all():
+            if _pack(food.pos) == updated_cell:
                 has_eaten = True
                 self.turn_count = 0
                 break
         # has_eaten = any(self.snake.intersects(food.pos) for food in self.food_items)
-        self.snake.move(direction, has_eaten)
+        self._sync_free_cells()
+        moves_before = self.snake.moves
+        food_before = self.food_items[:]
+        vacated = self.snake.move(move, has_eaten)
+        self._synced_moves = self.snake.moves
 
-        updated_position = self.snake.head().pos
+        if updated_cell in self._free_cells:
+            self._free_cells.remove(updated_cell)
+        if vacated is not None and self._is_interior(vacated) and not self.snake._intersects_cell(vacated):
+            self._free_cells.add(vacated)
 
-        self.seed += direction[0] * 10 + direction[1]
-        self.seed %= 2 ** 32
+        updated_position = _unpack(updated_cell)
+
+        if self.legacy_rng:
+            x, y = DIRECTIONS[index]
+            self.seed += x * 10 + y
+            self.seed %= 2 ** 32
 
         # TODO(matthew-c21): Ensure that all food items have unique positions so this loop doesn't execute more than
         #  once. Consider a map using position tuples as keys.
@@ -137,24 +338,75 @@ class GameState:
 
         self._update_food()
 
+        changed = [updated_cell] if vacated is None else [updated_cell, vacated]
+        if len(food_before) != len(self.food_items) or any(a is not b for a, b in zip(food_before, self.food_items)):
+            changed.extend(_pack(food.pos) for food in food_before + self.food_items)
+        self._update_matrix(changed, moves_before)
+        self._changed = changed
+        self.updates += 1
+
         if self.snake.intersects(updated_position, 1) or \
                 self._out_of_bounds(updated_position) or \
                 self.turn_count > self.max_drought:
             self.state_flag = False
 
+        if not self.state_flag and self.recorder is not None:
+            self.recorder.end(self)
+
         # TODO(matthew-c21): Test return value.
         return has_eaten
 
     def _update_food(self):
-        np.random.seed(self.seed)
+        rng = self.rng
         while len(self.food_items) < self.food_max:
-            # TODO(matthew-c21) - Optimize the selection algorithm to avoid possible slowdowns.
+            self._sync_free_cells()
+            if not self._free_cells:
+                # The snake covers the whole board, so the game has been won.
+                self.won = True
+                self.state_flag = False
+                return
+
+            if self.legacy_rng:
+                if rng is None:
+                    rng = np.random.RandomState(self.seed)
+                position = self._legacy_food_position(rng)
+            else:
+                position = _unpack(self._free_cells[rng.integers(len(self._free_cells))])
+
             # 100 is just a hard-coded value for all food items.
-            new_food = _food_item(np.array([np.random.randint(1, n) for n in (self.width, self.length)]), 1)
-            if self.snake.intersects(new_food.pos):
-                continue
+            self.food_items.append(_food_item(position, 1))
+
+    def _legacy_food_position(self, rng):
+        # A few rejection draws are tried first so that seeded games mostly keep their food positions. Once those fail,
+        # the food is drawn directly from the free cells, which is equally uniform and takes constant time, but no
+        # longer matches older versions, which kept drawing until a free cell came up.
+        for _ in range(_FOOD_ATTEMPTS):
+            position = np.array([rng.randint(1, n) for n in (self.width, self.length)])
+            if not self.snake.intersects(position):
+                return position
+
+        return _unpack(self._free_cells[rng.randint(len(self._free_cells))])
+
+    def _sync_free_cells(self):
+        """Rebuild the free cell index if the snake has been moved without going through update."""
+        if self._synced_moves == self.snake.moves:
+            return
+
+        cells = (_pack((x, y)) for y in range(1, self.length) for x in range(1, self.width))
+        self._free_cells = _FreeCells(cell for cell in cells if not self.snake._intersects_cell(cell))
+        self._synced_moves = self.snake.moves
 
-            self.food_items.append(new_food)
+    def is_blocked(self, direction):
+        """Whether the cell next to the head in the given direction is a wall or part of the snake.
+
+        Arguments:
+        direction: UP, DOWN, LEFT, or RIGHT, or its index in DIRECTIONS."""
+        cell = self.snake.head_cell() + _OFFSETS[direction_index(direction)]
+        return not self._is_interior(cell) or self.snake._intersects_cell(cell)
+
+    def _is_interior(self, cell):
+        y, x = divmod(cell, _STRIDE)
+        return 0 < x - _OFFSET < self.width and 0 < y - _OFFSET < self.length
 
     def _out_of_bounds(self, position):
         x, y = position
@@ -162,9 +414,35 @@ class GameState:
             return True
         return False
 
+    def copy(self):
+        """:returns an independent copy of this game, including its random state, which continues exactly as this one
+        would. The copy is not attached to a recorder."""
+        recorder, self.recorder = self.recorder, None
+        try:
+            return copy.deepcopy(self)
+        finally:
+            self.recorder = recorder
+
     def set_food(self, food):
+        if self.recorder is not None:
+            self.recorder.food(food)
         self.food_items = food
+        self._changed = None
+        self.updates += 1
         self._update_food()
+        # The matrix is rebuilt in place, so that read-only views of it keep following the game.
+        if self._matrix is not None:
+            self._build_matrix()
+
+    def changed_positions(self):
+        """List the cells which may look different since before the last call to update, being the new head, the
+        vacated tail, and any food eaten or placed. Renderers can use this to redraw only part of the board.
+
+        :returns a list of positions, or None if the last change was made by set_food and the whole board should be
+            redrawn."""
+        if self._changed is None:
+            return None
+        return [_unpack(cell) for cell in self._changed]
 
     def get_score(self):
         return self.score
@@ -172,36 +450,89 @@ class GameState:
     def is_playable(self):
         return self.state_flag
 
+    def is_won(self):
+        """Determine whether the game ended because there was no room left for food."""
+        return self.won
+
     def size(self):
         return self.width, self.length
 
     def food(self):
         return self.food_items
 
-    def to_matrix(self):
+    def to_matrix(self, out=None, readonly=False):
+        """Represent the board as a matrix indexed by row and column, with walls at -1, snake parts at -100, and food at
+        its value.
+
+        The matrix is kept up to date as the game is played rather than being rebuilt on every call.
+
+        Arguments:
+        out: an array of shape (length + 1, width + 1) to copy the matrix into. It is returned in place of a new array.
+        readonly: return a read-only view of the internal matrix instead of a copy. The view changes as the game is
+            updated."""
+        if self._matrix is None or self._matrix_moves != self.snake.moves:
+            self._build_matrix()
+
+        if out is not None:
+            np.copyto(out, self._matrix)
+            return out
+
+        if readonly:
+            view = self._matrix.view()
+            view.flags.writeable = False
+            return view
+
+        return self._matrix.copy()
+
+    def _build_matrix(self):
         # TODO(matthew-c21): Update tests and rendering to recognize walls being negative rather than 0.
         # TODO(matthew-c21): This represents game state, so it can probably be simplified to food and snake locations
         #  rather than including empty space.
-        matrix = np.zeros((self.length + 1, self.width + 1))  # Add 1 since OOB is at width/length.
+        background = np.zeros((self.length + 1, self.width + 1))  # Add 1 since OOB is at width/length.
 
-        # Make walls negative as well.
-        for i in range(self.width):
-            matrix[i, 0] = -1
-            matrix[i, self.length] = -1
+        # Make walls negative as well. Rows run along the length of the board and columns along its width.
+        background[:, 0] = -1
+        background[:, self.width] = -1
+        background[0, :] = -1
+        background[self.length, :] = -1
 
-        for i in range(self.length):
-            matrix[0, i] = -1
-            matrix[self.width, i] = -1
+        self._background = background
+        if self._matrix is None:
+            self._matrix = background.copy()
+        else:
+            np.copyto(self._matrix, background)
 
         for part in self.snake:
             x, y = part.pos
-            matrix[y, x] = -100  # numpy matrices are accessed row, column
+            self._matrix[y, x] = -100  # numpy matrices are accessed row, column
 
         for food in self.food_items:
             x, y = food.pos
-            matrix[y, x] = food.value
+            self._matrix[y, x] = food.value
+
+        self._matrix_moves = self.snake.moves
 
-        return matrix
+    def _update_matrix(self, cells, moves_before):
+        """Repaint only the given cells of the matrix after the snake has made a single move."""
+        if self._matrix is None or self._matrix_moves != moves_before:
+            return
+
+        for cell in cells:
+            y, x = divmod(cell, _STRIDE)
+            x -= _OFFSET
+            y -= _OFFSET
+            if not (0 <= x <= self.width and 0 <= y <= self.length):
+                continue
+
+            value = self._background[y, x]
+            if self.snake._intersects_cell(cell):
+                value = -100
+            for food in self.food_items:
+                if _pack(food.pos) == cell:
+                    value = food.value
+            self._matrix[y, x] = value
+
+        self._matrix_moves = self.snake.moves
 
     def get_primitive_state_vector(self):
         # TODO(matthew-c21): Unit test this method.
@@ -238,3 +569,299 @@ class GameState:
 
     def get_seed(self):
         return self.seed
+
+
+class BatchGameState:
+    """Runs many primitive boards in lockstep using NumPy arrays.
+
+    Each game follows the same rules as GameState. A game that is seeded identically to a GameState and given the same
+    moves ends up with the same snake, food, score, and playable state. Snake bodies are kept as ring buffers of packed
+    cell indices running from the head to the tail, and every board has an occupancy grid with a one cell margin so that
+    heads which leave the board can still be recorded."""
+
+    def __init__(self, count, length, width, start_pos, init_length, facing, food_max=1, seeds=None,
+                 max_drought=np.Inf, legacy_rng=False):
+        """Create `count` games, each holding a straight snake built the same way as Snake.
+
+        Arguments:
+        count: the number of games to run.
+        length, width: board dimensions, as in GameState.
+        start_pos: head position of every snake, given either as a single position or one position per game.
+        init_length: length of every snake including the head.
+        facing: UP, DOWN, LEFT, or RIGHT, or one direction per game.
+        food_max: the number of food items kept on each board.
+        seeds: one seed per game. Seeds are drawn at random when omitted.
+        max_drought: the number of turns a snake may go without eating.
+        legacy_rng: place food the way GameState does when given `legacy_rng`."""
+        self.count = count
+        self.length = length
+        self.width = width
+        self.food_max = food_max
+        self.max_drought = max_drought
+
+        # Positions in [-1, width + 1] x [-1, length + 1] are packed into a single integer, the cell index, as
+        # (y + 1) * stride + x + 1.
+        self.stride = width + 3
+        cells = (length + 3) * self.stride
+        self._capacity = cells + init_length
+
+        self.init_length = init_length
+        self._start_pos = np.broadcast_to(np.asarray(start_pos, dtype=np.int64), (count, 2)).copy()
+        self._start_facing = np.broadcast_to(np.asarray(facing, dtype=np.int64), (count, 2)).copy()
+
+        self.facing = self._start_facing.copy()
+        self.prev_move = np.zeros((count, 2), dtype=np.int64)
+        # The same directions as indices into DIRECTIONS, with -1 for no move yet.
+        self.facing_index = _vector_indices(self.facing)
+        self.prev_move_index = np.full(count, -1, dtype=np.int64)
+        self.heads = self._start_pos.copy()
+        self.head_index = np.zeros(count, dtype=np.int64)
+        self.lengths = np.full(count, init_length, dtype=np.int64)
+        self.body = np.zeros((count, self._capacity), dtype=np.int64)
+        self.has_eaten = np.zeros((count, self._capacity), dtype=bool)
+        self.occupancy = np.zeros((count, cells), dtype=np.int16)
+
+        interior = np.array([(x, y) for y in range(1, length) for x in range(1, width)], dtype=np.int64).reshape(-1, 2)
+        self._interior_cells = self.pack(interior)
+        self._interior = np.zeros(cells, dtype=bool)
+        self._interior[self._interior_cells] = True
+        self.free_cells = np.zeros((count, self._interior_cells.size), dtype=np.int64)
+        self.free_count = np.zeros(count, dtype=np.int64)
+        self.free_slots = np.full((count, cells), -1, dtype=np.int64)
+
+        self.food_items = np.full((count, food_max), -1, dtype=np.int64)
+        self.food_values = np.zeros((count, food_max), dtype=np.int64)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.turn_count = np.zeros(count, dtype=np.int64)
+        self.state_flag = np.ones(count, dtype=bool)
+        self.won = np.zeros(count, dtype=bool)
+
+        self.seeds = np.zeros(count, dtype=np.int64)
+        self.legacy_rng = legacy_rng
+        self.rngs = None if legacy_rng else [None] * count
+
+        self.reset(seeds=seeds)
+
+    def reset(self, games=None, seeds=None):
+        """Start games over with the snake they were created with, as though they had just been constructed.
+
+        Arguments:
+        games: the indices of the games to restart, or a boolean mask over all games. Every game is restarted when
+            omitted.
+        seeds: one new seed per restarted game. Seeds are drawn at random when omitted."""
+        if games is None:
+            games = np.arange(self.count)
+        games = np.asarray(games)
+        if games.dtype == bool:
+            games = np.flatnonzero(games)
+        if games.size == 0:
+            return
+
+        if seeds is None:
+            seeds = [_random_seed() for _ in games]
+        self.seeds[games] = np.array(seeds, dtype=np.int64).reshape(games.size)
+        if not self.legacy_rng:
+            for game in games:
+                self.rngs[game] = np.random.default_rng(self.seeds[game])
+
+        self.facing[games] = self._start_facing[games]
+        self.prev_move[games] = 0
+        self.facing_index[games] = _vector_indices(self._start_facing[games])
+        self.prev_move_index[games] = -1
+        self.heads[games] = self._start_pos[games]
+        self.head_index[games] = 0
+        self.lengths[games] = self.init_length
+        self.body[games] = 0
+        self.has_eaten[games] = False
+        self.occupancy[games] = 0
+
+        for i in range(self.init_length):
+            part = self.pack(self._start_pos[games] - i * self._start_facing[games])
+            self.body[games, i] = part
+            np.add.at(self.occupancy, (games, part), 1)
+
+        # Free interior cells are kept in the same swap-remove order as GameState so that food placement agrees.
+        interior = self._interior_cells
+        free = self.occupancy[games[:, None], interior] == 0
+        order = np.argsort(~free, axis=1, kind='stable')
+        self.free_cells[games] = interior[order]
+        self.free_count[games] = free.sum(axis=1)
+        self.free_slots[games] = -1
+        slots = np.broadcast_to(np.arange(interior.size), free.shape)
+        listed = slots < self.free_count[games, None]
+        self.free_slots[games[np.nonzero(listed)[0]], self.free_cells[games][listed]] = slots[listed]
+
+        self.food_items[games] = -1
+        self.food_values[games] = 0
+        self.score[games] = 0
+        self.turn_count[games] = 0
+        self.state_flag[games] = True
+        self.won[games] = False
+
+        for game in games:
+            self._update_food(game)
+
+    def step(self, directions):
+        """Advance every playable game by one move. Games that are no longer playable are left untouched.
+
+        Arguments:
+        directions: an array of shape (count, 2) holding one of UP, DOWN, LEFT, or RIGHT for each game, or an array of
+            shape (count,) holding indices into DIRECTIONS.
+
+        :returns a boolean array marking the games in which food was eaten this turn."""
+        directions = np.asarray(directions, dtype=np.int64)
+        if directions.ndim == 1:
+            directions = _DIRECTION_ARRAY[directions]
+        directions = directions.reshape(self.count, 2)
+        has_eaten = np.zeros(self.count, dtype=bool)
+
+        games = np.flatnonzero(self.state_flag)
+        if games.size == 0:
+            return has_eaten
+
+        requested = directions[games]
+        facing = self.facing[games]
+        reversed_moves = (requested + facing == 0).all(axis=1)
+        moves = np.where(reversed_moves[:, None], facing, requested)
+        self.facing[games] = moves
+        self.prev_move[games] = moves
+        self.facing_index[games] = _vector_indices(moves)
+        self.prev_move_index[games] = self.facing_index[games]
+        self.turn_count[games] += 1
+
+        heads = self.heads[games] + moves
+        cells = self.pack(heads)
+
+        eaten_food = self.food_items[games] == cells[:, None]
+        eaten = eaten_food.any(axis=1)
+        has_eaten[games] = eaten
+        self.turn_count[games[eaten]] = 0
+
+        # Drop the tail unless the food eaten there has been digested, exactly as Snake.move does.
+        tails = (self.head_index[games] + self.lengths[games] - 1) % self._capacity
+        growing = self.has_eaten[games, tails]
+        popped = ~growing
+        vacated = self.body[games[popped], tails[popped]]
+        self.occupancy[games[popped], vacated] -= 1
+        self.lengths[games[popped]] -= 1
+        self.has_eaten[games[growing], tails[growing]] = False
+
+        collided = self.occupancy[games, cells] > 0
+
+        new_index = (self.head_index[games] - 1) % self._capacity
+        self.body[games, new_index] = cells
+        self.has_eaten[games, new_index] = eaten
+        self.head_index[games] = new_index
+        self.lengths[games] += 1
+        self.occupancy[games, cells] += 1
+        self.heads[games] = heads
+
+        self._claim_free_cells(games, cells)
+        released = self._interior[vacated] & (self.occupancy[games[popped], vacated] == 0)
+        self._release_free_cells(games[popped][released], vacated[released])
+
+        self.score[games] += (self.food_values[games] * eaten_food).sum(axis=1)
+        self.food_items[games] = np.where(eaten_food, -1, self.food_items[games])
+
+        if self.legacy_rng:
+            self.seeds[games] = (self.seeds[games] + requested[:, 0] * 10 + requested[:, 1]) % 2 ** 32
+
+        for game in games[eaten]:
+            self._update_food(game)
+
+        x, y = heads[:, 0], heads[:, 1]
+        out_of_bounds = (x <= 0) | (x >= self.width) | (y <= 0) | (y >= self.length)
+        self.state_flag[games] &= ~(collided | out_of_bounds | (self.turn_count[games] > self.max_drought))
+
+        return has_eaten
+
+    def pack(self, positions):
+        """:returns the cell index of each (x, y) position on the last axis of `positions`. Positions beyond the margin
+        around the walls are clipped onto it."""
+        positions = np.clip(positions, -1, [self.width + 1, self.length + 1])
+        return (positions[..., 1] + 1) * self.stride + positions[..., 0] + 1
+
+    def unpack(self, cells):
+        """:returns the (x, y) position of each cell index, along a new last axis."""
+        y, x = np.divmod(cells, self.stride)
+        return np.stack([x - 1, y - 1], axis=-1)
+
+    def blocked(self):
+        """:returns a boolean array of shape (count, cells) marking, by cell index, the walls, snake parts, and the
+        margin beyond the walls of every board."""
+        return (self.occupancy > 0) | ~self._interior
+
+    def _claim_free_cells(self, games, cells):
+        """Remove one cell per game from the free cell index, ignoring cells which are not free."""
+        slots = self.free_slots[games, cells]
+        listed = slots >= 0
+        games, cells, slots = games[listed], cells[listed], slots[listed]
+
+        self.free_count[games] -= 1
+        last = self.free_cells[games, self.free_count[games]]
+        self.free_cells[games, slots] = last
+        self.free_slots[games, last] = slots
+        self.free_slots[games, cells] = -1
+
+    def _release_free_cells(self, games, cells):
+        """Add one cell per game to the free cell index."""
+        self.free_cells[games, self.free_count[games]] = cells
+        self.free_slots[games, cells] = self.free_count[games]
+        self.free_count[games] += 1
+
+    def _update_food(self, game):
+        """Refill the food of a single game, drawing positions the same way GameState does."""
+        present = self.food_items[game] >= 0
+        food = list(self.food_items[game, present])
+        values = list(self.food_values[game, present])
+
+        rng = np.random.RandomState(self.seeds[game]) if self.legacy_rng else self.rngs[game]
+        while len(food) < self.food_max:
+            if not self.free_count[game]:
+                self.won[game] = True
+                self.state_flag[game] = False
+                break
+
+            if self.legacy_rng:
+                cell = self._legacy_food_cell(game, rng)
+            else:
+                cell = self.free_cells[game, rng.integers(self.free_count[game])]
+
+            food.append(cell)
+            values.append(1)
+
+        self.food_items[game] = -1
+        self.food_values[game] = 0
+        self.food_items[game, :len(food)] = food
+        self.food_values[game, :len(values)] = values
+
+    def _legacy_food_cell(self, game, rng):
+        for _ in range(_FOOD_ATTEMPTS):
+            x, y = [rng.randint(1, n) for n in (self.width, self.length)]
+            cell = (y + 1) * self.stride + x + 1
+            if not self.occupancy[game, cell]:
+                return cell
+
+        return self.free_cells[game, rng.randint(self.free_count[game])]
+
+    def is_playable(self):
+        return self.state_flag.copy()
+
+    def is_won(self):
+        return self.won.copy()
+
+    def get_scores(self):
+        return self.score.copy()
+
+    def size(self):
+        return self.width, self.length
+
+    def snake(self, game):
+        """:returns the positions of a single snake as an array of shape (length, 2), ordered from head to tail."""
+        parts = (self.head_index[game] + np.arange(self.lengths[game])) % self._capacity
+        return self.unpack(self.body[game, parts])
+
+    def food(self, game):
+        """:returns the positions of the food in a single game as an array of shape (food, 2)."""
+        food = self.food_items[game]
+        return self.unpack(food[food >= 0])
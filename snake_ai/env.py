@@ -0,0 +1,249 @@
+"""Environments exposing the game through `reset` and `step`, in the style of OpenAI Gym.
+
+Actions are relative to the direction the snake faces: 0 keeps going straight, 1 turns left, and 2 turns right. `step`
+returns a tuple (obs, reward, done, info), where `done` is true once the game has ended.
+
+SnakeEnv wraps a single GameState. SnakeVecEnv steps many games at once on a BatchGameState, restarting finished games
+as part of the same step so that every observation it returns belongs to a game in progress. SubprocVecEnv splits the
+games of a SnakeVecEnv across worker processes."""
+import multiprocessing as mp
+
+import numpy as np
+
+import core
+import features
+
+_TURNS = np.array(core.TURNS)
+
+
+def determine_reward(playable, min_distance, has_eaten, won=False):
+    """Determines a reward in the range [-10, 100]. Winning returns 100, eating returns 10, while dying returns -10. Any
+    other rewards are based on the distance to the nearest food item.
+
+    :param playable boolean determining whether or not the new state is playable.
+    :param min_distance a value in [0, 1) determining how close the nearest food item is.
+    :param has_eaten a boolean determining whether or not the previous move resulted in eating.
+    :param won a boolean determining whether or not the game ended by filling the board."""
+    # A won game is no longer playable either, so it must be told apart from dying first.
+    if won:
+        return 100
+    # Punish game over.
+    elif not playable:
+        return -10
+    elif has_eaten:
+        return 10
+
+    return -min_distance
+
+
+def determine_rewards(playable, has_eaten, won):
+    """The rewards of `determine_reward` for a batch of moves, with no distance term.
+
+    :returns a float32 array with one reward per move."""
+    return np.where(won, 100, np.where(playable, np.where(has_eaten, 10, 0), -10)).astype(np.float32)
+
+
+def to_move(move, facing):
+    """Determines the absolute direction of motion given a relative movement and facing direction.
+    :param move an integer corresponding to the relative motion of the snake.
+        - 0 is straight.
+        - 1 is left.
+        - 2 is right
+        Other values are considered to be undefined.
+    :param facing one of UP, DOWN, LEFT, or RIGHT from the `snake_ai.core` module.
+    :returns the absolute direction after applying the given relative motion."""
+    if move == 0:
+        return facing
+    elif move == 1:
+        x, y = facing
+        return np.array([y, -x])  # Left rotation
+    elif move == 2:
+        x, y = facing
+        return np.array([-y, x])  # Right rotation
+
+
+def to_moves(moves, facing):
+    """The directions of `to_move` for a batch of moves.
+
+    Arguments:
+    moves: an array of relative moves.
+    facing: the index in core.DIRECTIONS of the direction each snake faces.
+
+    :returns an array of indices into core.DIRECTIONS."""
+    return (np.asarray(facing) + _TURNS[np.asarray(moves)]) % 4
+
+
+class SnakeEnv:
+    """A single game, restarted from the same snake on every `reset`."""
+
+    def __init__(self, length, width, init_dir=core.LEFT, max_drought=np.Inf, food_max=1, seed=None, recorder=None):
+        """Arguments:
+        length, width: board dimensions, as in GameState.
+        init_dir: the direction the snake faces at the start of each game. It starts as a single segment in the middle
+            of the board.
+        max_drought: the number of turns a snake may go without eating.
+        food_max: the number of food items kept on the board.
+        seed: seed from which the seed of each game is drawn.
+        recorder: a GameRecorder to record every game to."""
+        self.length = length
+        self.width = width
+        self.init_dir = init_dir
+        self.max_drought = max_drought
+        self.food_max = food_max
+        self.recorder = recorder
+        self.rng = np.random.default_rng(seed)
+        self.state = None
+
+    def reset(self, seed=None):
+        """Start a new game.
+
+        Arguments:
+        seed: the seed of the new game. One is drawn when omitted.
+
+        :returns the first observation."""
+        if seed is None:
+            seed = int(self.rng.integers(2 ** 63))
+
+        snake = core.Snake((self.width // 2 + 1, self.length // 2 + 1), 1, self.init_dir)
+        self.state = core.GameState(snake, self.length, self.width, food_max=self.food_max, seed=seed,
+                                    max_drought=self.max_drought, recorder=self.recorder)
+        return features.primitive_vector(self.state)
+
+    def step(self, action):
+        """Make a relative move.
+
+        :returns a tuple (obs, reward, done, info), where info holds the 'score' and whether food was 'eaten' and the
+            game 'won'."""
+        state = self.state
+        has_eaten = state.update(to_move(action, state.snake.facing))
+        playable = state.is_playable()
+
+        won = state.is_won()
+        info = {'score': state.get_score(), 'eaten': has_eaten, 'won': won}
+        return features.primitive_vector(state), determine_reward(playable, 0, has_eaten, won), not playable, info
+
+
+class SnakeVecEnv:
+    """Many games played in lockstep. Games which end are restarted with a fresh seed within the same `step`."""
+
+    def __init__(self, count, length, width, init_dir=core.LEFT, max_drought=np.Inf, food_max=1, seed=None,
+                 encoders=('primitive',)):
+        """Arguments:
+        count: the number of games.
+        length, width, init_dir, max_drought, food_max: the game configuration, as in SnakeEnv.
+        seed: seed from which the seed of each game is drawn.
+        encoders: names of the feature encoders making up each observation, as in features.encode."""
+        self.count = count
+        self.encoders = tuple(encoders)
+        self.rng = np.random.default_rng(seed)
+        self.batch = core.BatchGameState(count, length, width, (width // 2 + 1, length // 2 + 1), 1, init_dir,
+                                         food_max=food_max, seeds=self._seeds(count), max_drought=max_drought)
+        self.observation_size = features.size(self.encoders)
+
+    def _seeds(self, count):
+        return self.rng.integers(2 ** 63, size=count)
+
+    def _observe(self):
+        return features.encode(self.batch, self.encoders)
+
+    def reset(self):
+        """Restart every game.
+
+        :returns the observations, with one row per game."""
+        self.batch.reset(seeds=self._seeds(self.count))
+        return self._observe()
+
+    def step(self, actions):
+        """Make one relative move in every game.
+
+        :returns a tuple (obs, reward, done, info) of arrays with one entry per game. The observations of finished
+            games are those of their replacements, while info holds the 'score', 'won', and 'terminal_observation'
+            reached by every game before any were restarted, along with whether food was 'eaten'."""
+        batch = self.batch
+        eaten = batch.step(to_moves(actions, batch.facing_index))
+
+        done = ~batch.state_flag
+        rewards = determine_rewards(~done, eaten, batch.won)
+        info = {'score': batch.get_scores(), 'won': batch.is_won(), 'eaten': eaten,
+                'terminal_observation': self._observe()}
+
+        if done.any():
+            batch.reset(done, self._seeds(np.count_nonzero(done)))
+            obs = self._observe()
+        else:
+            obs = info['terminal_observation'].copy()
+        return obs, rewards, done, info
+
+    def close(self):
+        pass
+
+
+def _worker(connection, count, kwargs):
+    env = SnakeVecEnv(count, **kwargs)
+    while True:
+        command, data = connection.recv()
+        if command == 'step':
+            connection.send(env.step(data))
+        elif command == 'reset':
+            connection.send(env.reset())
+        elif command == 'close':
+            connection.close()
+            return
+
+
+class SubprocVecEnv:
+    """A SnakeVecEnv whose games are split as evenly as possible across worker processes, each stepping its share of
+    the games on its own BatchGameState. The games are numbered in order across the workers."""
+
+    def __init__(self, count, workers, seed=None, **kwargs):
+        """Arguments:
+        count: the total number of games.
+        workers: the number of processes.
+        seed: seed from which each worker's seed is derived.
+        kwargs: the remaining arguments of SnakeVecEnv, which must be picklable."""
+        context = mp.get_context('spawn')
+        self.count = count
+        self.observation_size = features.size(kwargs.get('encoders', ('primitive',)))
+        sizes = [len(games) for games in np.array_split(np.arange(count), workers)]
+        self._splits = np.cumsum(sizes)[:-1]
+        seeds = np.random.SeedSequence(seed).generate_state(workers)
+
+        self._connections = []
+        self._processes = []
+        for size, worker_seed in zip(sizes, seeds):
+            local, remote = context.Pipe()
+            process = context.Process(target=_worker, args=(remote, size, dict(kwargs, seed=int(worker_seed))),
+                                      daemon=True)
+            process.start()
+            remote.close()
+            self._connections.append(local)
+            self._processes.append(process)
+
+    def reset(self):
+        for connection in self._connections:
+            connection.send(('reset', None))
+        return np.concatenate([connection.recv() for connection in self._connections])
+
+    def step(self, actions):
+        for connection, part in zip(self._connections, np.split(np.asarray(actions), self._splits)):
+            connection.send(('step', part))
+        results = [connection.recv() for connection in self._connections]
+
+        obs, rewards, done, infos = zip(*results)
+        info = {key: np.concatenate([part[key] for part in infos]) for key in infos[0]}
+        return np.concatenate(obs), np.concatenate(rewards), np.concatenate(done), info
+
+    def close(self):
+        for connection in self._connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,220 @@
+"""Feature encoders turning boards into float32 observation vectors.
+
+`primitive_vector` encodes a single GameState the same way as `GameState.get_primitive_state_vector`, without
+allocating intermediate arrays. The other encoders work on a batch of boards at once with vectorized NumPy, and accept
+either a GameState or a BatchGameState through `boards`. Every encoder can write into a preallocated array, such as a
+row of a replay buffer.
+
+Directions relative to the snake are taken from the direction it faces, so that "left" is the snake's own left."""
+from collections import namedtuple
+
+import numpy as np
+
+import core
+
+# Board layout shared with BatchGameState: a one cell margin around the walls, with cells numbered row by row.
+Boards = namedtuple('Boards', ['blocked', 'stride', 'heads', 'facing', 'prev_move', 'food', 'width', 'length'])
+Boards.__doc__ = """A batch of boards reduced to what the encoders need.
+
+blocked: boolean array of shape (count, cells) marking walls, snake parts, and the margin beyond the walls.
+stride: the number of cells in a row, being width + 3.
+heads: the packed cell of each head.
+facing: the index in core.DIRECTIONS of the direction each snake faces.
+prev_move: the index of each snake's last move, or -1 before the first move.
+food: the (x, y) position of the first food item on each board, or (0, 0) if there is none.
+width, length: board dimensions, as in GameState."""
+
+_TURNS = np.array(core.TURNS)
+_DIRECTION_VECTORS = np.array(core.DIRECTIONS)
+
+
+def primitive_vector(state, out=None):
+    """Encode a single GameState as the 8 features of `GameState.get_primitive_state_vector`, with identical values.
+
+    The features are, in order: whether the head is left of and above the first food item, whether the cells ahead,
+    to the left, and to the right are blocked, and whether the last move was UP, LEFT, or RIGHT.
+
+    Arguments:
+    state: the GameState.
+    out: a float32 array of 8 elements to write into.
+
+    :returns the features as a float32 array."""
+    if out is None:
+        out = np.empty(8, dtype=np.float32)
+
+    x, y = state.snake.head_position()
+    # A won game has no food left, which is encoded as food at (0, 0) the same way as in `boards`.
+    food_x, food_y = state.food_items[0].pos if state.food_items else (0, 0)
+    out[0] = x < food_x
+    out[1] = y < food_y
+
+    direction = state.snake.direction
+    for i, turn in enumerate(core.TURNS):
+        out[2 + i] = state.is_blocked((direction + turn) % 4)
+
+    prev = -1 if state.prev_move is None else core.direction_index(state.prev_move)
+    out[5] = prev == 0
+    out[6] = prev == 3
+    out[7] = prev == 1
+    return out
+
+
+def boards(source):
+    """Gather the arrays the batch encoders need from a GameState, which becomes a batch of one, or a BatchGameState.
+
+    :returns a Boards tuple."""
+    if hasattr(source, 'occupancy'):
+        return _batch_boards(source)
+    return _game_boards(source)
+
+
+def _game_boards(state):
+    width, length = state.width, state.length
+    stride = width + 3
+    blocked = np.ones((1, length + 3, stride), dtype=bool)
+    blocked[0, 1:-1, 1:-1] = state.to_matrix(readonly=True) < 0
+
+    head_x, head_y = np.clip(state.snake.head().pos, -1, [width + 1, length + 1])
+    prev = -1 if state.prev_move is None else core.direction_index(state.prev_move)
+    food = state.food_items[0].pos if state.food_items else (0, 0)
+    return Boards(blocked.reshape((1, -1)), stride, np.array([(head_y + 1) * stride + head_x + 1]),
+                  np.array([state.snake.direction]), np.array([prev]),
+                  np.array([food], dtype=np.int64), width, length)
+
+
+def _batch_boards(batch):
+    first = batch.food_items[:, 0]
+    food = np.where((first >= 0)[:, None], batch.unpack(np.maximum(first, 0)), 0)
+    return Boards(batch.blocked(), batch.stride, batch.pack(batch.heads), batch.facing_index.copy(),
+                  batch.prev_move_index.copy(), food, batch.width, batch.length)
+
+
+def _offsets(stride):
+    """:returns the change in packed cell for each direction in core.DIRECTIONS."""
+    return np.array([y * stride + x for x, y in core.DIRECTIONS])
+
+
+def _output(out, count, width):
+    if out is None:
+        return np.empty((count, width), dtype=np.float32)
+    return out.reshape((count, width))
+
+
+def _head_positions(b):
+    y, x = np.divmod(b.heads, b.stride)
+    return x - 1, y - 1
+
+
+def primitive(b, out=None):
+    """The features of `primitive_vector` for a batch of boards.
+
+    :returns a float32 array of shape (count, 8)."""
+    count = len(b.heads)
+    out = _output(out, count, 8)
+    x, y = _head_positions(b)
+    out[:, 0] = x < b.food[:, 0]
+    out[:, 1] = y < b.food[:, 1]
+
+    offsets = _offsets(b.stride)
+    neighbours = b.heads[:, None] + offsets[(b.facing[:, None] + _TURNS) % 4]
+    out[:, 2:5] = np.take_along_axis(b.blocked, np.clip(neighbours, 0, b.blocked.shape[1] - 1), axis=1)
+
+    out[:, 5] = b.prev_move == 0
+    out[:, 6] = b.prev_move == 3
+    out[:, 7] = b.prev_move == 1
+    return out
+
+
+def danger(b, out=None):
+    """Whether each of the 8 cells around the head is blocked, starting ahead and going clockwise relative to the
+    direction the snake faces.
+
+    :returns a float32 array of shape (count, 8)."""
+    count = len(b.heads)
+    out = _output(out, count, 8)
+    offsets = _offsets(b.stride)
+    # Each straight direction, followed by the diagonal between it and the next one clockwise.
+    turns = (b.facing[:, None] + np.arange(4)) % 4
+    straight = offsets[turns]
+    diagonal = straight + offsets[(turns + 1) % 4]
+    around = np.stack([straight, diagonal], axis=2).reshape((count, 8))
+
+    cells = np.clip(b.heads[:, None] + around, 0, b.blocked.shape[1] - 1)
+    out[:] = np.take_along_axis(b.blocked, cells, axis=1)
+    return out
+
+
+def food_direction(b, out=None):
+    """The offset from the head to the first food item, as distances ahead and to the right of the snake scaled by
+    the board size, followed by whether the food lies ahead and whether it lies to the right.
+
+    :returns a float32 array of shape (count, 4)."""
+    count = len(b.heads)
+    out = _output(out, count, 4)
+    x, y = _head_positions(b)
+    dx, dy = b.food[:, 0] - x, b.food[:, 1] - y
+
+    forward = _DIRECTION_VECTORS[b.facing]
+    right = _DIRECTION_VECTORS[(b.facing + 1) % 4]
+    scale = max(b.width, b.length)
+    ahead = dx * forward[:, 0] + dy * forward[:, 1]
+    across = dx * right[:, 0] + dy * right[:, 1]
+
+    out[:, 0] = ahead / scale
+    out[:, 1] = across / scale
+    out[:, 2] = ahead > 0
+    out[:, 3] = across > 0
+    return out
+
+
+def body_rays(b, out=None):
+    """The number of free cells between the head and the nearest wall or snake part looking ahead, left, and right,
+    scaled by the board size.
+
+    :returns a float32 array of shape (count, 3)."""
+    count = len(b.heads)
+    out = _output(out, count, 3)
+    reach = max(b.width, b.length) + 1
+    offsets = _offsets(b.stride)[(b.facing[:, None] + _TURNS) % 4]
+    steps = np.arange(1, reach + 1)
+
+    # Every ray meets a wall before leaving the board, so clipping only affects cells past the first blocked one.
+    cells = np.clip(b.heads[:, None, None] + offsets[:, :, None] * steps, 0, b.blocked.shape[1] - 1)
+    hits = np.take_along_axis(b.blocked, cells.reshape((count, -1)), axis=1).reshape(cells.shape)
+    out[:] = np.argmax(hits, axis=2) / (reach - 1)
+    return out
+
+
+# Batch encoders by name, along with the number of features each produces.
+ENCODERS = {
+    'primitive': (primitive, 8),
+    'danger': (danger, 8),
+    'food_direction': (food_direction, 4),
+    'body_rays': (body_rays, 3),
+}
+
+
+def size(names):
+    """:returns the number of features produced by encoding with the named encoders."""
+    return sum(ENCODERS[name][1] for name in names)
+
+
+def encode(source, names=('primitive',), out=None):
+    """Encode boards with several encoders, placing their features side by side.
+
+    Arguments:
+    source: a GameState, a BatchGameState, or a Boards tuple from `boards`.
+    names: keys of ENCODERS, in the order their features should appear.
+    out: a float32 array of shape (count, size(names)) to write into.
+
+    :returns a float32 array of shape (count, size(names))."""
+    b = source if isinstance(source, Boards) else boards(source)
+    count = len(b.heads)
+    out = _output(out, count, size(names))
+
+    column = 0
+    for name in names:
+        encoder, width = ENCODERS[name]
+        encoder(b, out[:, column:column + width])
+        column += width
+    return out
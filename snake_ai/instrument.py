@@ -0,0 +1,125 @@
+"""Low overhead timing of the phases of a training run, along with optional profiling of individual games."""
+import cProfile
+import os
+import time
+
+
+class _Phase:
+    """Accumulates the time spent inside `with` blocks for a single phase."""
+
+    __slots__ = ['name', 'time', 'calls', '_start']
+
+    def __init__(self, name):
+        self.name = name
+        self.time = 0.0
+        self.calls = 0
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.time += time.perf_counter() - self._start
+        self.calls += 1
+
+
+class PhaseTimer:
+    """Records cumulative time and call counts for named phases of training, such as stepping the game or fitting the
+    model. Totals are kept for the current game and for the whole run.
+
+    Usage:
+        with timer.phase('step'):
+            state.update(move)"""
+
+    def __init__(self):
+        self._phases = {}
+        self.run = {}
+        self.run_steps = 0
+        self.run_games = 0
+        # Run totals as of the last summary, so that each summary can report rates over its own window.
+        self._window = ({}, 0, time.perf_counter(), {})
+
+    def phase(self, name):
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(name)
+        return phase
+
+    def end_game(self, steps):
+        """Fold the totals for the game that just finished into the run totals.
+
+        :returns a dictionary mapping each phase to its (time, calls) during that game."""
+        game = {name: (phase.time, phase.calls) for name, phase in self._phases.items()}
+        for name, (elapsed, calls) in game.items():
+            total_time, total_calls = self.run.get(name, (0.0, 0))
+            self.run[name] = (total_time + elapsed, total_calls + calls)
+
+        self._phases = {}
+        self.run_steps += steps
+        self.run_games += 1
+        return game
+
+    def summary(self, counters=None):
+        """Describe the work done since the last summary.
+
+        Arguments:
+        counters: optional mapping of names to running totals, such as the number of model predictions made so far.
+            The rate at which each has grown is included.
+
+        :returns a multi-line string."""
+        counters = counters or {}
+        last_run, last_steps, last_time, last_counters = self._window
+        now = time.perf_counter()
+        elapsed = now - last_time
+        steps = self.run_steps - last_steps
+
+        lines = ['%d steps in %.2f s (%.1f steps/s)' % (steps, elapsed, steps / elapsed if elapsed else 0)]
+        for name, count in counters.items():
+            grown = count - last_counters.get(name, 0)
+            lines.append('  %-20s %10d %10.1f/s' % (name, grown, grown / elapsed if elapsed else 0))
+
+        for name, (total_time, total_calls) in sorted(self.run.items(), key=lambda item: -item[1][0]):
+            previous_time, previous_calls = last_run.get(name, (0.0, 0))
+            phase_time = total_time - previous_time
+            calls = total_calls - previous_calls
+            lines.append('  %-20s %8.3f s %5.1f%% %10d calls %10.3f ms/call' % (
+                name, phase_time, 100 * phase_time / elapsed if elapsed else 0, calls,
+                1000 * phase_time / calls if calls else 0))
+
+        self._window = (dict(self.run), self.run_steps, now, dict(counters))
+        return '\n'.join(lines)
+
+
+class GameProfiler:
+    """Runs selected games under cProfile, writing one stats file per game that can be read with pstats or snakeviz."""
+
+    def __init__(self, games, directory='.'):
+        """Arguments:
+        games: the numbers of the games to profile.
+        directory: where to write the files, named profile_game_<number>.prof."""
+        self.games = set(games)
+        self.directory = directory
+        self._profile = None
+        self._game = None
+
+    def start(self, game):
+        if game not in self.games:
+            return
+        self._game = game
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self):
+        """Stop profiling the current game, if it is being profiled.
+
+        :returns the path of the stats file written, or None."""
+        if self._profile is None:
+            return None
+
+        self._profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, 'profile_game_%d.prof' % self._game)
+        self._profile.dump_stats(path)
+        self._profile = None
+        return path
@@ -0,0 +1,254 @@
+"""Replay memory used to retrain agents on past transitions."""
+import json
+import os
+
+import numpy as np
+
+# Arrays saved by ReplayBuffer.save, one file each.
+_FIELDS = ('states', 'actions', 'rewards', 'done', 'chained')
+
+
+class ReplayBuffer:
+    """Fixed size store of (state, action, reward, next_state, done) transitions.
+
+    Every field is kept in a preallocated NumPy array and written at a moving cursor, so once the buffer is full the
+    oldest transitions are overwritten. There is no per-transition object overhead, which allows capacities in the
+    millions.
+
+    Each observation is stored once. Transitions are expected in the order they were played, so one which is not done
+    is followed by the transition starting from its next state. That next state is then read from the following
+    transition's state rather than being kept separately. Only the next states of finished games, and of the newest
+    transition until another is added, are held on their own."""
+
+    def __init__(self, capacity, state_shape, state_dtype=np.float32, seed=None):
+        """Arguments:
+        capacity: the maximum number of transitions held at once.
+        state_shape: the shape of a single state, for example (8,).
+        state_dtype: the type used to store states.
+        seed: seed for the generator used when sampling."""
+        self.capacity = capacity
+        self.state_shape = tuple(state_shape)
+        self.states = np.zeros((capacity,) + self.state_shape, dtype=state_dtype)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.done = np.zeros(capacity, dtype=bool)
+        # Whether the next state of each transition is the state of the one stored after it.
+        self.chained = np.zeros(capacity, dtype=bool)
+        # Next states of the transitions which are not chained, by index.
+        self.tails = {}
+        self.cursor = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        """Store a single transition, overwriting the oldest one if the buffer is full.
+
+        :returns the index the transition was written to."""
+        i = self.cursor
+        state = np.reshape(state, self.state_shape)
+
+        # The previous transition is the newest, so its next state is held as a tail until this one continues its game.
+        previous = (i - 1) % self.capacity
+        if self.size and self.capacity > 1 and not self.done[previous]:
+            self.chained[previous] = True
+            self.tails.pop(previous, None)
+
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.done[i] = done
+        self.chained[i] = False
+        self.tails[i] = np.array(np.reshape(next_state, self.state_shape), dtype=self.states.dtype)
+
+        self.cursor = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def sample_indices(self, batch_size):
+        """Draw up to `batch_size` distinct indices uniformly from the stored transitions."""
+        return self.rng.choice(self.size, min(batch_size, self.size), replace=False, shuffle=False)
+
+    def get(self, indices):
+        """:returns the arrays (states, actions, rewards, next_states, done) for the given indices."""
+        indices = np.asarray(indices)
+        next_states = self.states[(indices + 1) % self.capacity]
+        for row in np.flatnonzero(~self.chained[indices]):
+            next_states[row] = self.tails[int(indices[row])]
+
+        return self.states[indices], self.actions[indices], self.rewards[indices], next_states, self.done[indices]
+
+    def sample(self, batch_size):
+        """Draw a batch of distinct transitions uniformly at random.
+
+        :returns the arrays (states, actions, rewards, next_states, done)."""
+        return self.get(self.sample_indices(batch_size))
+
+    def sample_with_weights(self, batch_size):
+        """Draw indices for a training batch along with the weight each transition should be given when fitting.
+
+        Sampling is uniform here, so every weight is 1.
+
+        :returns the arrays (indices, weights)."""
+        indices = self.sample_indices(batch_size)
+        return indices, np.ones(len(indices), dtype=np.float32)
+
+    def update_priorities(self, indices, errors):
+        """Report the TD errors measured for sampled transitions. Uniform sampling ignores them."""
+        pass
+
+    def save(self, directory):
+        """Write the buffer to a directory holding one .npy file per field, which `load` can memory map."""
+        os.makedirs(directory, exist_ok=True)
+        for field in _FIELDS:
+            np.save(os.path.join(directory, field + '.npy'), getattr(self, field))
+
+        slots = sorted(self.tails)
+        tails = np.array([self.tails[slot] for slot in slots], dtype=self.states.dtype).reshape(
+            (len(slots),) + self.state_shape)
+        np.save(os.path.join(directory, 'tail_slots.npy'), np.array(slots, dtype=np.int64))
+        np.save(os.path.join(directory, 'tails.npy'), tails)
+
+        with open(os.path.join(directory, 'buffer.json'), 'w') as f:
+            json.dump({'capacity': self.capacity, 'cursor': self.cursor, 'size': self.size}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None, seed=None):
+        """Read a buffer written by `save`.
+
+        Arguments:
+        directory: the directory passed to `save`.
+        mmap_mode: passed on to np.load. Use 'r+' to memory map the arrays instead of reading them into memory, with
+            new transitions written straight back to disk. The next states kept apart from the states are always read
+            into memory.
+        seed: seed for the generator used when sampling."""
+        with open(os.path.join(directory, 'buffer.json')) as f:
+            meta = json.load(f)
+
+        arrays = {field: np.load(os.path.join(directory, field + '.npy'), mmap_mode=mmap_mode) for field in _FIELDS}
+        slots = np.load(os.path.join(directory, 'tail_slots.npy'))
+        tails = np.load(os.path.join(directory, 'tails.npy'))
+
+        buffer = cls.__new__(cls)
+        buffer.capacity = meta['capacity']
+        buffer.state_shape = arrays['states'].shape[1:]
+        for field, array in arrays.items():
+            setattr(buffer, field, array)
+        buffer.tails = {int(slot): tail for slot, tail in zip(slots, tails)}
+        buffer.cursor = meta['cursor']
+        buffer.size = meta['size']
+        buffer.rng = np.random.default_rng(seed)
+        return buffer
+
+
+class SumTree:
+    """Binary tree in which every node holds the sum of its children, allowing sampling in proportion to the value of
+    each leaf and updates to those values in O(log n)."""
+
+    def __init__(self, capacity):
+        self.leaf_count = 1
+        while self.leaf_count < capacity:
+            self.leaf_count *= 2
+        # The root is at index 1, and the children of node i are 2i and 2i + 1.
+        self.tree = np.zeros(2 * self.leaf_count)
+
+    def total(self):
+        return self.tree[1]
+
+    def leaves(self, indices):
+        return self.tree[np.asarray(indices) + self.leaf_count]
+
+    def update(self, indices, values):
+        """Set the values of the given leaves and refresh every sum above them."""
+        nodes = np.asarray(indices) + self.leaf_count
+        if not nodes.size:
+            return
+        self.tree[nodes] = values
+
+        nodes = np.unique(nodes // 2)
+        while nodes[0] > 0:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        """Find the leaves at which the running sum of leaf values first exceeds each of the given values."""
+        values = np.array(values, dtype=float)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaf_count:
+            left = 2 * nodes
+            go_right = values >= self.tree[left]
+            values -= np.where(go_right, self.tree[left], 0)
+            nodes = left + go_right
+
+        return nodes - self.leaf_count
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Replay buffer which samples transitions in proportion to their last TD error.
+
+    New transitions are given the highest priority seen so far so that they are likely to be replayed soon after being
+    stored. Importance sampling weights correct for the bias that prioritized sampling introduces."""
+
+    def __init__(self, capacity, state_shape, state_dtype=np.float32, seed=None, alpha=0.6, beta=0.4,
+                 beta_increment=0.001, epsilon=1e-3):
+        """Arguments:
+        capacity, state_shape, state_dtype, seed: as in ReplayBuffer.
+        alpha: how strongly priorities skew sampling, with 0 being uniform.
+        beta: initial strength of the importance sampling correction, raised towards 1 each time a batch is drawn.
+        beta_increment: amount added to beta per batch.
+        epsilon: added to every error so that no transition becomes impossible to draw."""
+        super().__init__(capacity, state_shape, state_dtype, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.priorities = SumTree(capacity)
+
+    def add(self, state, action, reward, next_state, done):
+        i = super().add(state, action, reward, next_state, done)
+        self.priorities.update([i], [self.max_priority])
+        return i
+
+    def sample_indices(self, batch_size):
+        """Draw `batch_size` indices with probability proportional to priority, one from each of `batch_size` equal
+        slices of the total priority."""
+        batch_size = min(batch_size, self.size)
+        total = self.priorities.total()
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        # Guard against rounding carrying a value past the last stored transition.
+        return np.minimum(self.priorities.find(np.minimum(values, np.nextafter(total, 0))), self.size - 1)
+
+    def sample_with_weights(self, batch_size):
+        indices = self.sample_indices(batch_size)
+        probabilities = self.priorities.leaves(indices) / self.priorities.total()
+        weights = (self.size * probabilities) ** -self.beta
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        return indices, (weights / weights.max()).astype(np.float32)
+
+    def update_priorities(self, indices, errors):
+        priorities = (np.abs(errors) + self.epsilon) ** self.alpha
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.priorities.update(indices, priorities)
+
+    def save(self, directory):
+        super().save(directory)
+        np.save(os.path.join(directory, 'priorities.npy'), self.priorities.leaves(np.arange(self.capacity)))
+
+        with open(os.path.join(directory, 'priorities.json'), 'w') as f:
+            json.dump({'alpha': self.alpha, 'beta': self.beta, 'beta_increment': self.beta_increment,
+                       'epsilon': self.epsilon, 'max_priority': self.max_priority}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None, seed=None):
+        buffer = super().load(directory, mmap_mode, seed)
+
+        with open(os.path.join(directory, 'priorities.json')) as f:
+            for name, value in json.load(f).items():
+                setattr(buffer, name, value)
+
+        buffer.priorities = SumTree(buffer.capacity)
+        buffer.priorities.update(np.arange(buffer.capacity), np.load(os.path.join(directory, 'priorities.npy')))
+        return buffer
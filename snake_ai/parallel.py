@@ -0,0 +1,157 @@
+"""Parallel self-play. Worker processes play games with a snapshot of the policy and stream their transitions back to a
+single learner, which trains on them and periodically sends out updated weights.
+
+Workers act through `policy.PolicyAgent` by default, so they never load TensorFlow."""
+import multiprocessing as mp
+import queue
+
+import numpy as np
+
+from env import SnakeEnv
+from policy import PolicyAgent
+
+
+def play_game(agent, length, width, init_dir, max_drought, seed=None):
+    """Play a single game without training, recording every transition.
+
+    Arguments:
+    agent: the agent choosing moves.
+    length, width, init_dir, max_drought: the game configuration, as in SnakeEnv.
+    seed: seed from which the game's seed is drawn.
+
+    :returns a tuple (states, actions, rewards, next_states, done) of stacked arrays along with the final score."""
+    env = SnakeEnv(length, width, init_dir, max_drought=max_drought, seed=seed)
+    states, actions, rewards, next_states, done = [], [], [], [], []
+    new_state = env.reset().reshape((1, -1))
+    ended = False
+
+    while not ended:
+        old_state = new_state
+        action = agent.make_choice(old_state)
+        obs, reward, ended, _ = env.step(action)
+        new_state = obs.reshape((1, -1))
+
+        states.append(old_state)
+        actions.append(action)
+        rewards.append(reward)
+        next_states.append(new_state)
+        done.append(ended)
+
+    transitions = (np.vstack(states), np.array(actions), np.array(rewards, dtype=float), np.vstack(next_states),
+                   np.array(done))
+    return transitions, env.state.get_score()
+
+
+def _default_agent(input_dim):
+    return PolicyAgent()
+
+
+def _worker(seed, make_agent, input_dim, game_args, weights, results, stop):
+    np.random.seed(seed)
+    # Each game is seeded from the worker's seed, so that the games a worker plays can be reproduced.
+    game_seeds = np.random.default_rng(seed)
+    agent = make_agent(input_dim)
+    # Wait for the first snapshot, since the agent may not have any weights of its own.
+    snapshot = weights.get()
+
+    while not stop.is_set():
+        # Only the most recent snapshot matters, so skip any that arrived while the last game was being played.
+        try:
+            while True:
+                snapshot = weights.get_nowait()
+        except queue.Empty:
+            pass
+
+        if snapshot is not None:
+            agent.set_weights(snapshot[0])
+            agent.epsilon = snapshot[1]
+            snapshot = None
+
+        game = play_game(agent, *game_args, seed=int(game_seeds.integers(2 ** 63)))
+        while not stop.is_set():
+            try:
+                results.put(game, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+
+def _next_result(results, processes, poll=1.0):
+    """Wait for the next game from the workers, checking every `poll` seconds that none of them have died. Workers only
+    exit once told to stop, so one which has exited before then has failed."""
+    while True:
+        try:
+            return results.get(timeout=poll)
+        except queue.Empty:
+            for process in processes:
+                if process.exitcode is not None:
+                    raise RuntimeError('Worker process %d exited with code %d' % (process.pid, process.exitcode))
+
+
+def train(agent, input_dim, workers, count, length, width, init_dir, max_drought, sync_every=1,
+          make_agent=_default_agent, seed=None, first_game=1, on_game=None):
+    """Train `agent` on `count` games played by `workers` processes.
+
+    Every transition received is committed with `agent.remember`, and `agent.replay_new` runs once per game received.
+    Workers are sent the output of `agent.dump_weights` along with the current epsilon every `sync_every` games.
+
+    Arguments:
+    agent: the learner.
+    input_dim: the shape of the state vector, passed on to `make_agent`.
+    workers: the number of processes playing games.
+    count: the number of games to train on.
+    length, width, init_dir, max_drought: the game configuration used by every worker.
+    sync_every: the number of games trained on between weight broadcasts.
+    make_agent: a picklable callable taking the input dimensions and returning the agent a worker plays with. The agent
+        needs `make_choice`, `set_weights`, and an `epsilon` attribute.
+    seed: seed from which each worker's seed is derived.
+    first_game: the number given to the first game, such as one more than the games already played when resuming.
+    on_game: called as on_game(number, score, steps) once each game has been trained on, for example to save a
+        checkpoint.
+
+    :returns the highest score achieved. Raises RuntimeError if a worker dies."""
+    context = mp.get_context('spawn')
+    results = context.Queue(maxsize=2 * workers)
+    stop = context.Event()
+    weights = [context.Queue() for _ in range(workers)]
+    seeds = np.random.SeedSequence(seed).generate_state(workers)
+
+    def broadcast():
+        snapshot = (agent.dump_weights(), agent.epsilon)
+        for q in weights:
+            q.put(snapshot)
+
+    broadcast()
+    game_args = (length, width, init_dir, max_drought)
+    processes = [context.Process(target=_worker, daemon=True,
+                                 args=(int(seeds[i]), make_agent, input_dim, game_args, weights[i], results, stop))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    high_score = 0
+    try:
+        for i in range(first_game, first_game + count):
+            transitions, score = _next_result(results, processes)
+            for transition in zip(*transitions):
+                agent.remember(*transition)
+
+            print('Game: %d, Score: %d' % (i, score))
+            agent.replay_new()
+            high_score = max(high_score, score)
+
+            if i % sync_every == 0:
+                broadcast()
+            if on_game is not None:
+                on_game(i, score, len(transitions[1]))
+    finally:
+        stop.set()
+        # Snapshots still waiting to be sent are of no use once the workers stop, and would otherwise hold up exiting.
+        for q in weights:
+            q.cancel_join_thread()
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+    return high_score
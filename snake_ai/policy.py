@@ -0,0 +1,125 @@
+"""Inference for the agent's network in plain NumPy.
+
+Keras spends far longer setting up a call to `predict` than the network itself takes to evaluate a handful of states,
+so acting goes through a copy of the weights held here instead. Nothing in this module depends on TensorFlow, which lets
+worker processes play games without loading it."""
+import numpy as np
+
+
+def save_weights(path, weights):
+    """Write a list of weight arrays, such as the output of `Agent.dump_weights`, to a single .npz file."""
+    np.savez(path, **{'w%d' % i: np.asarray(array) for i, array in enumerate(weights)})
+
+
+def load_weights(path):
+    """Read a list of weight arrays written by `save_weights`."""
+    with np.load(path) as arrays:
+        return [arrays['w%d' % i] for i in range(len(arrays.files))]
+
+
+class NumpyPolicy:
+    """Evaluates a stack of dense layers with ReLU activations between them and a softmax output, as built by
+    `ai.DefaultAgent._network`, using float32 matrix products."""
+
+    def __init__(self, weights=None):
+        """Arguments:
+        weights: a list alternating between kernels and biases, as returned by `Agent.dump_weights`."""
+        self.layers = []
+        if weights is not None:
+            self.set_weights(weights)
+
+    def set_weights(self, weights):
+        """Replace the weights with copies of the given list of alternating kernels and biases."""
+        if len(weights) % 2:
+            raise ValueError('Expected alternating kernels and biases, got %d arrays' % len(weights))
+
+        self.layers = [(np.array(kernel, dtype=np.float32), np.array(bias, dtype=np.float32))
+                       for kernel, bias in zip(weights[::2], weights[1::2])]
+
+    def get_weights(self):
+        return [array for layer in self.layers for array in layer]
+
+    def blend(self, weights, tau):
+        """Move every weight the fraction `tau` of the way towards the matching entry of `weights`, as in Polyak
+        averaging of a target network."""
+        for array, new in zip(self.get_weights(), weights):
+            array *= 1 - tau
+            array += tau * np.asarray(new, dtype=np.float32)
+
+    def logits(self, states):
+        """:returns the outputs of the final layer before the softmax, with one row per state."""
+        x = np.asarray(states, dtype=np.float32).reshape((-1, self.layers[0][0].shape[0]))
+        for kernel, bias in self.layers[:-1]:
+            x = x @ kernel
+            x += bias
+            np.maximum(x, 0, out=x)
+
+        kernel, bias = self.layers[-1]
+        x = x @ kernel
+        x += bias
+        return x
+
+    def predict(self, states):
+        """Equivalent to `model.predict` on the network the weights came from.
+
+        :returns the action probabilities, with one row per state."""
+        x = self.logits(states)
+        x -= x.max(axis=1, keepdims=True)
+        np.exp(x, out=x)
+        x /= x.sum(axis=1, keepdims=True)
+        return x
+
+    def act(self, states):
+        """Choose the most probable action for each state. The softmax preserves order, so it is skipped.
+
+        :returns an array of actions, with one entry per state."""
+        return np.argmax(self.logits(states), axis=1)
+
+
+def epsilon_greedy(policy, states, epsilon, actions=3):
+    """Choose an action for every state in a batch, taking a random action with probability `epsilon` and otherwise the
+    policy's choice. All of the greedy rows go through a single forward pass.
+
+    Arguments:
+    policy: a NumpyPolicy.
+    states: an array with one state per row.
+    epsilon: the chance of a random action for each state.
+    actions: the number of actions to pick from at random.
+
+    :returns an array of actions, with one entry per state."""
+    states = np.asarray(states)
+    states = states.reshape((len(states), -1))
+    choices = np.random.randint(actions, size=len(states))
+
+    greedy = np.random.rand(len(states)) >= epsilon
+    if greedy.any():
+        choices[greedy] = policy.act(states[greedy])
+    return choices
+
+
+class PolicyAgent:
+    """Plays epsilon-greedily with a NumpyPolicy without learning anything, for use by processes that only generate
+    games. It answers `make_choice` and `make_choices` in the same way as `ai.DefaultAgent`."""
+
+    def __init__(self, weights=None, epsilon=0.0, actions=3):
+        """Arguments:
+        weights: initial weights, as in NumpyPolicy.
+        epsilon: the chance of a random move.
+        actions: the number of moves to pick from at random."""
+        self.policy = NumpyPolicy(weights)
+        self.epsilon = epsilon
+        self.actions = actions
+
+    def set_weights(self, weights):
+        self.policy.set_weights(weights)
+
+    def dump_weights(self):
+        return self.policy.get_weights()
+
+    def make_choice(self, game_state):
+        if np.random.rand() < self.epsilon:
+            return np.random.randint(self.actions)
+        return self.policy.act(game_state)[0]
+
+    def make_choices(self, game_states):
+        return epsilon_greedy(self.policy, game_states, self.epsilon, self.actions)
@@ -0,0 +1,383 @@
+"""Compact recordings of played games.
+
+A game is stored as its configuration, seed, initial snake, and initial food, followed by every move requested of it
+packed into 2 bits. Food placement is reproduced from the seed on playback, so food only appears in a recording when it
+was set by hand through `GameState.set_food`. Games are appended to a file one after another and read back one at a
+time, so a file may hold far more games than fit in memory.
+
+File layout, with all integers little endian:
+    magic: b'SNAKEREC' followed by a version byte.
+    games, each made of:
+        header: length, width, food_max (uint16), max_drought (float64), seed (uint64), legacy_rng (bool), facing
+            (uint8), snake length (uint32).
+        snake: (x, y) int16 pairs from the head to the tail, then one bit per segment marking undigested food.
+        food: count (uint16), then (x, y, value) as int16, int16, int32.
+        chunks, each starting with a tag byte:
+            _MOVES: move count (varint), then 4 moves per byte starting from the low bits.
+            _FOOD: food set before the next move, laid out as above.
+            _END: moves (varint), score (varint), flags (uint8: 1 if won, 2 if still playable). Ends the game.
+"""
+import heapq
+import os
+import struct
+
+import numpy as np
+
+import core
+
+MAGIC = b'SNAKEREC\x01'
+
+_HEADER = struct.Struct('<HHHdQ?BI')
+_FOOD_COUNT = struct.Struct('<H')
+_FOOD_ITEM = np.dtype([('x', '<i2'), ('y', '<i2'), ('value', '<i4')])
+
+_MOVES = 0
+_FOOD = 1
+_END = 2
+
+_WON = 1
+_PLAYABLE = 2
+
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(f):
+    value = 0
+    shift = 0
+    while True:
+        byte = _read(f, 1)[0]
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value
+        shift += 7
+
+
+class TruncatedGame(ValueError):
+    """Raised when a recording ends part way through a game, as it does when the process writing it was stopped before
+    the game ended."""
+
+
+def _read(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise TruncatedGame('Recording ends part way through a game')
+    return data
+
+
+def _pack_moves(moves):
+    moves = np.frombuffer(moves, dtype=np.uint8)
+    padded = np.zeros(-(-len(moves) // 4) * 4, dtype=np.uint8)
+    padded[:len(moves)] = moves
+    padded = padded.reshape((-1, 4))
+    return (padded[:, 0] | padded[:, 1] << 2 | padded[:, 2] << 4 | padded[:, 3] << 6).tobytes()
+
+
+def _unpack_moves(data, count):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    return (packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8) & 3).reshape(-1)[:count]
+
+
+def _encode_food(food):
+    items = np.zeros(len(food), dtype=_FOOD_ITEM)
+    for i, item in enumerate(food):
+        items[i] = (item.pos[0], item.pos[1], item.value)
+    return _FOOD_COUNT.pack(len(food)) + items.tobytes()
+
+
+def _read_food(f):
+    count, = _FOOD_COUNT.unpack(_read(f, _FOOD_COUNT.size))
+    items = np.frombuffer(_read(f, count * _FOOD_ITEM.itemsize), dtype=_FOOD_ITEM)
+    return [core._food_item(np.array([item['x'], item['y']], dtype=int), int(item['value'])) for item in items]
+
+
+class GameRecorder:
+    """Appends games to a recording as they are played. Pass it to GameState as `recorder` and every move made through
+    `update` is written down, with the game closed off once it is over.
+
+    Moves are held in memory until the game ends or `flush_moves` of them have built up, then written as one chunk.
+    A game left unfinished at the end of an existing recording, by a process which stopped without closing its
+    recorder, is cut off before anything is appended."""
+
+    def __init__(self, path, flush_moves=1 << 16):
+        """Arguments:
+        path: the file to append to. It is created if it does not exist.
+        flush_moves: the number of moves buffered before they are written out."""
+        if os.path.exists(path) and os.path.getsize(path):
+            with _open(path) as f:
+                end = _complete_end(f)
+            if end < os.path.getsize(path):
+                os.truncate(path, end)
+
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+        self.flush_moves = flush_moves
+        self.games = 0
+        self._state = None
+        self._moves = bytearray()
+        self._move_count = 0
+
+    def begin(self, state):
+        """Start recording a game. Any game still being recorded is ended first."""
+        if self._state is not None:
+            self.end(self._state)
+
+        if not 0 <= state.seed < 2 ** 64:
+            raise ValueError('Seeds must fit in 64 bits to be recorded, got ' + str(state.seed))
+
+        parts = list(state.snake)
+        positions = np.array([part.pos for part in parts], dtype='<i2')
+        eaten = np.packbits(np.array([part.has_eaten for part in parts], dtype=bool), bitorder='little')
+
+        self._file.write(_HEADER.pack(state.length, state.width, state.food_max, state.max_drought, state.seed,
+                                      state.legacy_rng, core.direction_index(state.snake.facing), len(parts)))
+        self._file.write(positions.tobytes())
+        self._file.write(eaten.tobytes())
+        self._file.write(_encode_food(state.food_items))
+
+        self._state = state
+        self._move_count = 0
+
+    def move(self, index):
+        """Record the index of the direction requested for the next move."""
+        self._moves.append(index)
+        self._move_count += 1
+        if len(self._moves) >= self.flush_moves:
+            self._flush_moves()
+
+    def food(self, food):
+        """Record food set by hand before the next move."""
+        self._flush_moves()
+        self._file.write(bytes([_FOOD]) + _encode_food(food))
+
+    def end(self, state):
+        """Finish recording the current game, storing its result. Does nothing if no game is being recorded."""
+        if self._state is None:
+            return
+
+        self._flush_moves()
+        flags = (_WON if state.is_won() else 0) | (_PLAYABLE if state.is_playable() else 0)
+        self._file.write(bytes([_END]) + _varint(self._move_count) + _varint(int(state.get_score())) + bytes([flags]))
+        self._file.flush()
+        self._state = None
+        self.games += 1
+
+    def close(self):
+        if self._state is not None:
+            self.end(self._state)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _flush_moves(self):
+        if self._moves:
+            self._file.write(bytes([_MOVES]) + _varint(len(self._moves)) + _pack_moves(self._moves))
+            self._moves = bytearray()
+
+
+class GameRecord:
+    """A single game read back from a recording."""
+
+    def __init__(self, offset, header, positions, eaten, food):
+        self.offset = offset
+        (self.length, self.width, self.food_max, self.max_drought, self.seed, self.legacy_rng, self.facing,
+         _) = header
+        self.positions = positions
+        self.eaten = eaten
+        self.food = food
+        self.moves = np.zeros(0, dtype=np.uint8)
+        # Pairs of (move number, food) for food set by hand before the given move.
+        self.food_events = []
+        self.turns = 0
+        self.score = 0
+        self.won = False
+        self.playable = False
+
+    def new_state(self):
+        """:returns a GameState as it was when recording began."""
+        snake = core.Snake.from_parts(self.positions, self.eaten, self.facing)
+        state = core.GameState(snake, self.length, self.width, food_max=self.food_max, seed=self.seed,
+                               max_drought=self.max_drought, legacy_rng=self.legacy_rng)
+        if not _same_food(state.food_items, self.food):
+            state.set_food(list(self.food))
+        return state
+
+    def replay(self, snapshot_every=1000):
+        """:returns a Replay of this game, for seeking to any move."""
+        return Replay(self.new_state(), self.moves, snapshot_every, self.food_events)
+
+    def play(self):
+        """Play the game back from the start.
+
+        :returns a generator yielding the same GameState before any moves and again after each move."""
+        replay = Replay(self.new_state(), self.moves, len(self.moves) + 1, self.food_events)
+        yield replay.state
+        for _ in range(len(self.moves)):
+            yield replay.step()
+
+
+class Replay:
+    """Moves through a game given its initial state and moves, jumping to any move without replaying the whole game.
+
+    A copy of the state is kept every `snapshot_every` moves as they are first reached. Seeking starts from the latest
+    snapshot at or before the target, or from the current position if that is closer, so reaching any move takes at
+    most `snapshot_every` updates once the snapshots up to it exist."""
+
+    def __init__(self, initial_state, moves, snapshot_every=1000, food_events=()):
+        """Arguments:
+        initial_state: the GameState before any moves. It is copied, and never changed.
+        moves: the moves to play, as directions or their indices in core.DIRECTIONS.
+        snapshot_every: the number of moves between snapshots.
+        food_events: pairs of (move number, food) for food to set by hand before the given move."""
+        self.moves = moves
+        self.snapshot_every = snapshot_every
+        self.food_events = {}
+        for i, food in food_events:
+            self.food_events.setdefault(i, []).append(food)
+
+        self.snapshots = {0: initial_state.copy()}
+        self.state = initial_state.copy()
+        self.position = 0
+
+    def __len__(self):
+        return len(self.moves)
+
+    def seek(self, index):
+        """Move to the state after the first `index` moves, clamped to the length of the game.
+
+        :returns the state, which is the same object until a snapshot is restored."""
+        index = max(0, min(index, len(self.moves)))
+        snapshot = min(index // self.snapshot_every * self.snapshot_every, max(self.snapshots))
+        if not snapshot <= self.position <= index:
+            self.state = self.snapshots[snapshot].copy()
+            self.position = snapshot
+
+        while self.position < index:
+            self.step()
+        return self.state
+
+    def step(self):
+        """Play the next move, if there is one.
+
+        :returns the state."""
+        if self.position >= len(self.moves):
+            return self.state
+
+        for food in self.food_events.get(self.position, ()):
+            self.state.set_food(list(food))
+        self.state.update(self.moves[self.position])
+        self.position += 1
+
+        if self.position % self.snapshot_every == 0 and self.position not in self.snapshots:
+            self.snapshots[self.position] = self.state.copy()
+        return self.state
+
+
+def _same_food(a, b):
+    return len(a) == len(b) and all((x.pos == y.pos).all() and x.value == y.value for x, y in zip(a, b))
+
+
+def _read_game(f, moves):
+    offset = f.tell()
+    data = f.read(_HEADER.size)
+    if not data:
+        return None
+    if len(data) != _HEADER.size:
+        raise TruncatedGame('Recording ends part way through a game')
+
+    header = _HEADER.unpack(data)
+    count = header[-1]
+    positions = np.frombuffer(_read(f, 4 * count), dtype='<i2').reshape((count, 2)).astype(int)
+    eaten = np.unpackbits(np.frombuffer(_read(f, -(-count // 8)), dtype=np.uint8), count=count, bitorder='little')
+    record = GameRecord(offset, header, positions, eaten.astype(bool), _read_food(f))
+
+    chunks = []
+    total = 0
+    while True:
+        tag = _read(f, 1)[0]
+        if tag == _MOVES:
+            n = _read_varint(f)
+            size = -(-n // 4)
+            if moves:
+                chunks.append(_unpack_moves(_read(f, size), n))
+            else:
+                f.seek(size, os.SEEK_CUR)
+            total += n
+        elif tag == _FOOD:
+            record.food_events.append((total, _read_food(f)))
+        elif tag == _END:
+            record.turns = _read_varint(f)
+            record.score = _read_varint(f)
+            flags = _read(f, 1)[0]
+            record.won = bool(flags & _WON)
+            record.playable = bool(flags & _PLAYABLE)
+            break
+        else:
+            raise ValueError('Unknown chunk %d in game at offset %d' % (tag, offset))
+
+    if chunks:
+        record.moves = np.concatenate(chunks)
+    return record
+
+
+def _complete_end(f):
+    """:returns the offset just past the last game in a recording which was written to its end."""
+    end = f.tell()
+    try:
+        while _read_game(f, False) is not None:
+            end = f.tell()
+    except TruncatedGame:
+        pass
+    return end
+
+
+def _open(path):
+    f = open(path, 'rb')
+    if f.read(len(MAGIC)) != MAGIC:
+        f.close()
+        raise ValueError('Not a game recording: ' + str(path))
+    return f
+
+
+def read_games(path, moves=True):
+    """Read the games in a recording one at a time. A game left unfinished at the end of the recording is skipped.
+
+    Arguments:
+    path: the recording.
+    moves: whether to decode the moves. Skipping them makes scanning a large recording much faster.
+
+    :returns a generator of GameRecord."""
+    with _open(path) as f:
+        while True:
+            try:
+                record = _read_game(f, moves)
+            except TruncatedGame:
+                return
+            if record is None:
+                return
+            yield record
+
+
+def read_game(path, offset):
+    """Read the single game starting at `offset`, as given by GameRecord.offset."""
+    with _open(path) as f:
+        f.seek(offset)
+        return _read_game(f, True)
+
+
+def top_games(path, k):
+    """:returns the `k` highest scoring games in a recording, best first."""
+    best = heapq.nlargest(k, ((record.score, -record.offset) for record in read_games(path, moves=False)))
+    return [read_game(path, -offset) for _, offset in best]
@@ -1,9 +1,12 @@
-import curses
 import time
-import pygame
 import numpy as np
 from abc import ABC, abstractmethod
 
+from recording import Replay
+
+# curses and pygame are imported by the renderers that use them, so that importing this module stays cheap and works on
+# machines without a display.
+
 
 class Renderer(ABC):
     """Showing the game itself requires some level of persistent resources as well as actual rendering logic. This class
@@ -19,17 +22,50 @@ class Renderer(ABC):
         pass
 
     @abstractmethod
-    def replay(self, initial_state, moves, replay_speed):
+    def replay(self, initial_state, moves, replay_speed, start=0, stop=None, snapshot_every=1000):
         """Given an initial game state and a list of moves, play back the game from start to the point at which moves
         are no longer given.
 
         Arguments
-        initial_state: An instance of GameState representing the initial state of the game.
-        moves: the list of movements (UP, DOWN, LEFT, RIGHT) representing the movements taken during the game.
-        food: list of tuples in the form (turn, food) representing when food appears as well as the food itself.
-        replay_speed: the number of moves to be taken per second."""
+        initial_state: An instance of GameState representing the initial state of the game. It is left unchanged.
+        moves: the list of movements (UP, DOWN, LEFT, RIGHT) representing the movements taken during the game, or a
+            recording.Replay of them, whose snapshots are reused.
+        replay_speed: the number of moves to be taken per second. 0 plays back as fast as possible.
+        start: the number of moves to skip before rendering anything.
+        stop: the number of moves after which to stop, or None to play every move.
+        snapshot_every: the number of moves between the snapshots kept for seeking.
+
+        :returns the Replay, which can be passed back in to play another part of the game without starting over."""
         pass
 
+    def _play(self, initial_state, moves, replay_speed, start, stop, snapshot_every):
+        """Implementation of replay shared by all renderers. The speed may be changed while playing through
+        `_poll_speed`."""
+        replay = moves if isinstance(moves, Replay) else Replay(initial_state, moves, snapshot_every)
+        stop = len(replay) if stop is None else min(stop, len(replay))
+
+        self.render(replay.seek(start))
+        deadline = time.perf_counter()
+        while replay.position < stop:
+            replay_speed = self._poll_speed(replay_speed)
+            if replay_speed is None:
+                break
+
+            if replay_speed > 0:
+                # Wait against a running deadline so that rendering time doesn't slow playback down.
+                deadline = max(deadline + 1 / replay_speed, time.perf_counter())
+                time.sleep(max(0.0, deadline - time.perf_counter()))
+
+            self.render(replay.step())
+
+        return replay
+
+    def _poll_speed(self, replay_speed):
+        """Check for input during a replay.
+
+        :returns the new speed, or None to stop the replay."""
+        return replay_speed
+
     @abstractmethod
     def close(self):
         """Discard any allocated resources associated with the rendering process."""
@@ -44,73 +80,121 @@ class Renderer(ABC):
 class TerminalRenderer(Renderer):
     # TODO(matthew-c21): Come up with some kind of visual customization options.
     """Renders snake to the terminal using the ncurses library. This class should be utilized inside of the
-    curses.wrapper method to avoid any lingering modifications to terminal function."""
+    curses.wrapper method to avoid any lingering modifications to terminal function.
+
+    The last frame drawn is kept so that each new frame only writes the characters which differ from it, followed by a
+    single refresh. Walls are only written with the first frame after creation or `clear`."""
 
     def clear(self):
         self.stdscr.clear()
+        self._frame = None
+        self._text = {}
+
+    def __init__(self, max_fps=None):
+        """Arguments:
+        max_fps: the most frames drawn per second. Frames requested sooner than that after the last one are dropped,
+            apart from those showing the end of a game."""
+        import curses
 
-    def __init__(self):
         self.stdscr = curses.initscr()
         curses.noecho()
         curses.cbreak()
         self.stdscr.keypad(True)
 
+        self.max_fps = max_fps
+        self._last_frame_time = None
+        self._frame = None
+        self._text = {}
+
     def render(self, game_state, game_count=None):
-        self.stdscr.clear()
+        """Draw the game, unless the frame rate cap drops the frame.
+
+        :returns whether the frame was drawn."""
+        now = time.perf_counter()
+        if self.max_fps and self._last_frame_time is not None and game_state.is_playable() and \
+                now - self._last_frame_time < 1 / self.max_fps:
+            return False
+        self._last_frame_time = now
 
-        # TODO(matthew-c21): This currently assumes that both the game state is a matrix representing the screen, and
-        #  that spaces are 0.
         max_x, max_y = game_state.size()
-        matrix = game_state.to_matrix()
-
-        # Render corners.
-        self.stdscr.addstr(0, 0, '+')
-        self.stdscr.addstr(max_y, 0, '+')
-        self.stdscr.addstr(max_y, max_x, '+')
-        self.stdscr.addstr(0, max_x, '+')
-
-        # Render vertical walls.
-        for i in range(1, max_y):
-            self.stdscr.addstr(i, 0, '|')
-            self.stdscr.addstr(i, max_x, '|')
-
-        # Render horizontal walls.
-        for i in range(1, max_x):
-            self.stdscr.addstr(0, i, '-')
-            self.stdscr.addstr(max_y, i, '-')
-
-        # Render snake and food.
-        for y in range(max_x):
-            row = matrix[y]
-            for x, val in enumerate(row):
-                if val < 0:  # Snake part
-                    self.stdscr.addstr(y, x, "o")
-                elif val > 0:  # Food
-                    self.stdscr.addstr(y, x, "x")
+        frame = self._build_frame(game_state)
+
+        if self._frame is None or self._frame.shape != frame.shape:
+            self.stdscr.clear()
+            self._text = {}
+            rows = [(y, 0, ''.join(row)) for y, row in enumerate(frame)]
+        else:
+            rows = _changed_runs(self._frame, frame)
+
+        for y, x, text in rows:
+            self._draw(y, x, text)
+        self._frame = frame
 
         # Render debugging info.
-        self.stdscr.addstr(0, max_x + 4, "Head pos: " + str(game_state.snake.head().pos))
-        self.stdscr.addstr(max_y // 3, max_x + 4, "Playable? " + str(game_state.is_playable()))
-        self.stdscr.addstr(max_y - 1, max_x + 4, "Score: " + str(game_state.get_score()))
+        self._draw_text(0, max_x + 4, "Head pos: " + str(game_state.snake.head().pos))
+        self._draw_text(max_y // 3, max_x + 4, "Playable? " + str(game_state.is_playable()))
+        self._draw_text(max_y - 1, max_x + 4, "Score: " + str(game_state.get_score()))
 
         if game_count is not None:
-            self.stdscr.addstr(2 * max_y // 3, max_x + 4, "Game " + str(game_count))
+            self._draw_text(2 * max_y // 3, max_x + 4, "Game " + str(game_count))
 
         # Actually draw to screen.
         self.stdscr.refresh()
-
-    def replay(self, initial_state, moves, replay_speed):
-        delay = 1 / replay_speed
-
-        # Render the initial state.
-        self.render(initial_state)
-
-        for move in moves:
-            initial_state.update(move)
-            self.render(initial_state)
-            time.sleep(delay)
+        return True
+
+    @staticmethod
+    def _build_frame(game_state):
+        """:returns an array holding the character shown in each cell of the board, indexed by row and column."""
+        # TODO(matthew-c21): This currently assumes that snake parts are -100 and food is positive in the matrix.
+        matrix = game_state.to_matrix(readonly=True)
+        frame = np.full(matrix.shape, ' ')
+
+        frame[:, 0] = frame[:, -1] = '|'
+        frame[0, :] = frame[-1, :] = '-'
+        frame[0, 0] = frame[0, -1] = frame[-1, 0] = frame[-1, -1] = '+'
+
+        frame[matrix > 0] = 'x'
+        frame[matrix == -100] = 'o'
+        return frame
+
+    def _draw(self, y, x, text):
+        import curses
+
+        try:
+            self.stdscr.addstr(y, x, text)
+        except curses.error:
+            # Writing the bottom right corner of the window moves the cursor off screen, which curses reports as an
+            # error even though the text is drawn.
+            pass
+
+    def _draw_text(self, y, x, text):
+        """Write a line of text beside the board if it differs from the line last written there."""
+        previous = self._text.get((y, x), '')
+        if text != previous:
+            self._draw(y, x, text.ljust(len(previous)))
+            self._text[(y, x)] = text
+
+    def replay(self, initial_state, moves, replay_speed, start=0, stop=None, snapshot_every=1000):
+        """See Renderer.replay. While playing, + and - double and halve the speed, and q stops."""
+        self.async_keys(True)
+        try:
+            return self._play(initial_state, moves, replay_speed, start, stop, snapshot_every)
+        finally:
+            self.async_keys(False)
+
+    def _poll_speed(self, replay_speed):
+        key = self.get_key()
+        if key == ord('q'):
+            return None
+        elif key in (ord('+'), ord('=')):
+            return replay_speed * 2
+        elif key == ord('-'):
+            return replay_speed / 2
+        return replay_speed
 
     def close(self):
+        import curses
+
         curses.echo()
         curses.nocbreak()
         self.stdscr.keypad(False)
@@ -126,10 +210,25 @@ class TerminalRenderer(Renderer):
         return self.stdscr.getch()
 
 
+def _changed_runs(old, new):
+    """Compare two frames of the same shape.
+
+    :returns a list of (row, column, text) covering, for each row which differs, the span from its first to its last
+        changed character."""
+    runs = []
+    for y in np.flatnonzero((old != new).any(axis=1)):
+        changed = np.flatnonzero(old[y] != new[y])
+        start, stop = changed[0], changed[-1] + 1
+        runs.append((int(y), int(start), ''.join(new[y, start:stop])))
+    return runs
+
+
 class PygameRenderer(Renderer):
     """Pygame renderer focused around only having a single food type on screen.
     This class does not manage its own clock."""
     def __init__(self, length, width, block_size):
+        import pygame
+
         pygame.font.init()
         self.block_size = block_size
         self.length = length
@@ -138,39 +237,118 @@ class PygameRenderer(Renderer):
         self.font = pygame.font.SysFont('Arial', 24)
         self.window = pygame.display.set_mode((self.text_area_start + 150, (length + 1) * block_size))
 
+        # What is on screen, so that frames can be drawn as changes from the last one.
+        self._state = None
+        self._seen = None
+        self._score = None
+        self._score_surface = None
+        self._score_rect = pygame.Rect(self.text_area_start, 0, 0, 0)
+
     def render(self, game_state):
+        """Draw the game, touching only the cells which changed if the last frame showed the same game one update
+        earlier, and nothing at all if it has not changed since."""
+        import pygame
+
+        seen = (game_state.updates, game_state.snake.moves)
+        if game_state is self._state and seen == self._seen:
+            return
+
+        changed = game_state.changed_positions()
+        if game_state is not self._state or changed is None or \
+                (game_state.updates - 1, game_state.snake.moves - 1) != self._seen:
+            self._draw_all(game_state)
+        else:
+            dirty = [self._draw_cell(game_state, position) for position in changed]
+            if any(self._on_wall(position) for position in changed):
+                self._draw_border()
+            dirty += self._draw_score(game_state.get_score())
+            pygame.display.update(dirty)
+
+        self._state = game_state
+        self._seen = seen
+
+    def _draw_all(self, game_state):
+        import pygame
+
         self.window.fill((255, 255, 255))
 
         for segment in game_state.snake:
-            (x, y) = self.block_size * np.array(segment.pos)
-            r = pygame.Rect((x, y), (self.block_size, self.block_size))
-            pygame.draw.rect(self.window, (0, 255, 0), r)
+            pygame.draw.rect(self.window, (0, 255, 0), self._cell_rect(segment.pos))
 
         for segment in game_state.food():
-            (x, y) = self.block_size * np.array(segment.pos)
-            r = pygame.Rect((x, y), (self.block_size, self.block_size))
-            pygame.draw.rect(self.window, (255, 0, 0), r)
+            pygame.draw.rect(self.window, (255, 0, 0), self._cell_rect(segment.pos))
+
+        self._score = None
+        self._draw_score(game_state.get_score())
+        self._draw_border()
+
+        pygame.display.update()
+
+    def _draw_cell(self, game_state, position):
+        import pygame
 
-        text_surface = self.font.render('Score: ' + str(game_state.get_score()), False, (0, 0, 0))
-        self.window.blit(text_surface, (self.text_area_start, self.length * self.block_size // 2))
+        rect = self._cell_rect(position)
+        color = (255, 255, 255)
+        if game_state.snake.intersects(position):
+            color = (0, 255, 0)
+        elif any((food.pos == position).all() for food in game_state.food()):
+            color = (255, 0, 0)
+        pygame.draw.rect(self.window, color, rect)
+        return rect
+
+    def _draw_score(self, score):
+        """Draw the score if it differs from the one on screen, reusing the rendered text otherwise.
+
+        :returns the rectangles which changed."""
+        if score == self._score:
+            return []
+
+        erased = self._score_rect
+        self.window.fill((255, 255, 255), erased)
+        self._score = score
+        self._score_surface = self.font.render('Score: ' + str(score), False, (0, 0, 0))
+        self._score_rect = self.window.blit(self._score_surface,
+                                            (self.text_area_start, self.length * self.block_size // 2))
+        return [erased, self._score_rect]
+
+    def _draw_border(self):
+        import pygame
 
         # Add a rectangle around the play area.
         r = pygame.Rect(0, 0, (self.width + 1) * self.block_size, (self.length + 1) * self.block_size)
-
         pygame.draw.rect(self.window, (0, 0, 0), r, 1)
 
-        pygame.display.update()
+    def _cell_rect(self, position):
+        import pygame
+
+        x, y = position
+        return pygame.Rect(int(x) * self.block_size, int(y) * self.block_size, self.block_size, self.block_size)
+
+    def _on_wall(self, position):
+        x, y = position
+        return x <= 0 or x >= self.width or y <= 0 or y >= self.length
 
-    def replay(self, initial_state, moves, replay_speed):
-        # Render the initial state.
-        self.render(initial_state)
+    def replay(self, initial_state, moves, replay_speed, start=0, stop=None, snapshot_every=1000):
+        """See Renderer.replay. While playing, + and - double and halve the speed, and closing the window stops."""
+        return self._play(initial_state, moves, replay_speed, start, stop, snapshot_every)
 
-        for move in moves:
-            initial_state.update(move)
-            self.render(initial_state)
+    def _poll_speed(self, replay_speed):
+        import pygame
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return None
+            elif event.type == pygame.KEYDOWN and event.unicode in ('+', '='):
+                replay_speed *= 2
+            elif event.type == pygame.KEYDOWN and event.unicode == '-':
+                replay_speed /= 2
+        return replay_speed
 
     def close(self):
+        import pygame
+
         pygame.quit()
 
     def clear(self):
         self.window.fill((255, 255, 255))
+        self._state = None
@@ -0,0 +1,271 @@
+"""Front ends driven by an asyncio event loop.
+
+Reading input, advancing the game, and drawing it run as separate tasks. The game advances on a fixed schedule, and a
+frame is only drawn after the game has changed, so a game being watched leaves the process idle between moves instead
+of redrawing the same frame many times a second. A long running loop, such as training, can share the event loop with a
+Viewer through TimeSlice, letting the viewer show games at human speed while the loop runs at full speed."""
+import asyncio
+import sys
+import time
+
+import core
+from recording import Replay
+
+# Returned by controls when the player asks to stop.
+QUIT = 'quit'
+
+
+class PygameControls:
+    """Arrow keys steer and closing the window quits. Pygame offers no way to wait for events without blocking, so its
+    event queue is checked every `interval` seconds."""
+
+    def __init__(self, interval=1 / 60):
+        import pygame
+
+        self.interval = interval
+        self._keys = {
+            pygame.K_UP: core.UP,
+            pygame.K_DOWN: core.DOWN,
+            pygame.K_LEFT: core.LEFT,
+            pygame.K_RIGHT: core.RIGHT,
+        }
+        self._pending = []
+
+    async def next_event(self):
+        """:returns the next direction requested, or QUIT."""
+        import pygame
+
+        while not self._pending:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self._pending.append(QUIT)
+                elif event.type == pygame.KEYDOWN and event.key in self._keys:
+                    self._pending.append(self._keys[event.key])
+
+            if not self._pending:
+                await asyncio.sleep(self.interval)
+
+        return self._pending.pop(0)
+
+
+class TerminalControls:
+    """Arrow keys steer and q quits. Keys are read from a TerminalRenderer once standard input becomes readable, falling
+    back to checking every `interval` seconds where the event loop cannot watch it."""
+
+    def __init__(self, renderer, interval=1 / 60):
+        import curses
+
+        self.renderer = renderer
+        self.interval = interval
+        self._keys = {
+            curses.KEY_UP: core.UP,
+            curses.KEY_DOWN: core.DOWN,
+            curses.KEY_LEFT: core.LEFT,
+            curses.KEY_RIGHT: core.RIGHT,
+            ord('q'): QUIT,
+        }
+        renderer.async_keys(True)
+
+    async def next_event(self):
+        """:returns the next direction requested, or QUIT."""
+        while True:
+            key = self.renderer.get_key()
+            while key != -1:
+                if key in self._keys:
+                    return self._keys[key]
+                key = self.renderer.get_key()
+
+            await self._readable()
+
+    async def _readable(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        try:
+            loop.add_reader(sys.stdin.fileno(), ready.set_result, None)
+        except (NotImplementedError, ValueError):
+            await asyncio.sleep(self.interval)
+            return
+
+        try:
+            await ready
+        finally:
+            loop.remove_reader(sys.stdin.fileno())
+
+
+class GameRunner:
+    """Plays or replays games on a renderer at a fixed number of moves per second.
+
+    Games are played inside `async with`, which reads input for as long as it lasts so that one listener serves any
+    number of games:
+
+        async with runner:
+            await runner.play(state, core.LEFT)"""
+
+    def __init__(self, renderer, controls, moves_per_second):
+        """Arguments:
+        renderer: the Renderer to draw with.
+        controls: PygameControls, TerminalControls, or anything else with a `next_event` coroutine.
+        moves_per_second: the speed at which games advance."""
+        self.renderer = renderer
+        self.controls = controls
+        self.moves_per_second = moves_per_second
+        self.direction = None
+        self.quit = False
+        self.frames = 0
+        self._stopped = None
+        self._dirty = None
+        self._listener = None
+
+    async def __aenter__(self):
+        # Events are created here, inside the running loop, since older versions of asyncio tie them to a loop.
+        self._stopped = asyncio.Event()
+        self._dirty = asyncio.Event()
+        self._listener = asyncio.ensure_future(self._listen())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+
+    async def _listen(self):
+        while True:
+            event = await self.controls.next_event()
+            if event is QUIT:
+                self.quit = True
+                self._stopped.set()
+                return
+            self.direction = event
+
+    async def play(self, state, direction):
+        """Let the player steer `state` until the game ends or they quit.
+
+        Arguments:
+        state: the GameState to play.
+        direction: the direction to move in until the player picks another.
+
+        :returns whether the game ran to its end."""
+        self.direction = direction
+
+        def advance():
+            state.update(self.direction)
+            return state.is_playable()
+
+        return await self._run(state, advance)
+
+    async def watch(self, initial_state, moves):
+        """Replay a game from its initial state and moves, as in Renderer.replay.
+
+        :returns whether the replay ran to its end."""
+        replay = moves if isinstance(moves, Replay) else Replay(initial_state, moves, len(moves) + 1)
+
+        def advance():
+            replay.step()
+            return replay.position < len(replay)
+
+        return await self._run(replay.state, advance)
+
+    async def _run(self, state, advance):
+        drawing = asyncio.ensure_future(self._draw(state))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        finished = False
+        self._dirty.set()
+        try:
+            while not finished and not self.quit:
+                # Wait against a running deadline so that drawing doesn't slow the game down.
+                deadline = max(deadline + 1 / self.moves_per_second, loop.time())
+                if await self._wait_for_quit(deadline - loop.time()):
+                    break
+
+                finished = not advance()
+                self._dirty.set()
+        finally:
+            drawing.cancel()
+
+        # The last change may not have been drawn before the drawing task was cancelled.
+        if self._dirty.is_set() and not self.quit:
+            self._render(state)
+        return finished
+
+    async def _wait_for_quit(self, timeout):
+        try:
+            await asyncio.wait_for(self._stopped.wait(), max(0.0, timeout))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _draw(self, state):
+        while True:
+            await self._dirty.wait()
+            self._render(state)
+
+    def _render(self, state):
+        self._dirty.clear()
+        self.renderer.render(state)
+        self.frames += 1
+
+
+class Viewer:
+    """Shows games offered by a long running loop, one at a time at the runner's speed. A game offered while another
+    is being shown replaces any game still waiting, so the viewer never falls behind."""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.watching = False
+        self._game = None
+        self._offered = None
+
+    @property
+    def closed(self):
+        """Whether the player has asked to stop."""
+        return self.runner.quit
+
+    def offer(self, initial_state, moves):
+        """Queue a game to be shown, given its initial state and the moves made from it."""
+        self._game = (initial_state, moves)
+        self._offered.set()
+
+    async def _show(self):
+        while not self.closed:
+            await self._offered.wait()
+            self._offered.clear()
+            game, self._game = self._game, None
+            self.watching = True
+            try:
+                await self.runner.watch(*game)
+            finally:
+                self.watching = False
+
+    async def alongside(self, work):
+        """Run the coroutine `work` while showing the games it offers. Once it is done, the game being shown and any
+        still waiting are played out unless the player quits.
+
+        :returns the result of `work`."""
+        self._offered = asyncio.Event()
+        async with self.runner:
+            showing = asyncio.ensure_future(self._show())
+            try:
+                result = await work
+                while not self.closed and (self._game is not None or self.watching):
+                    await asyncio.sleep(1 / self.runner.moves_per_second)
+            finally:
+                showing.cancel()
+            return result
+
+
+class TimeSlice:
+    """Lets a loop that never waits on anything share the event loop, by yielding to other tasks once `budget` seconds
+    have passed since it last did."""
+
+    def __init__(self, budget=0.01):
+        self.budget = budget
+        self._last = time.perf_counter()
+
+    async def pause(self):
+        if time.perf_counter() - self._last >= self.budget:
+            await asyncio.sleep(0)
+            self._last = time.perf_counter()
@@ -1,16 +1,9 @@
+import asyncio
 import curses
 
 import core
 from render import TerminalRenderer
-
-
-def convert(keycode, default=None):
-    return {
-        curses.KEY_UP: core.UP,
-        curses.KEY_DOWN: core.DOWN,
-        curses.KEY_LEFT: core.LEFT,
-        curses.KEY_RIGHT: core.RIGHT,
-    }.get(keycode, default)
+from runner import GameRunner, TerminalControls
 
 
 def handle_game_over(game_state):
@@ -18,25 +11,21 @@ def handle_game_over(game_state):
         print(game_state.score, file=logfile)
 
 
-def main(*args):
-    init_dir = core.LEFT
-    length = 10
-    width = 10
+async def play(init_dir, length, width, moves_per_second):
     snake = core.Snake((width // 2, length // 2), 1, init_dir)
     state = core.GameState(snake, length, width)
     renderer = TerminalRenderer()
 
-    # A do-while loop would be nice here.
-    renderer.render(state)
-    input_dir = convert(renderer.get_key(), init_dir)
-
-    while state.is_playable():
-        state.update(input_dir)
-        renderer.render(state)
-        input_dir = convert(renderer.get_key(), input_dir)
+    # The snake moves on its own at a steady pace, turning whenever an arrow key is pressed. q quits.
+    async with GameRunner(renderer, TerminalControls(renderer), moves_per_second) as runner:
+        await runner.play(state, init_dir)
 
     renderer.close()
 
 
+def main(*args):
+    asyncio.run(play(core.LEFT, 10, 10, 4))
+
+
 if __name__ == '__main__':
     curses.wrapper(main)
@@ -1,68 +1,86 @@
 import argparse
+import asyncio
 import logging
+import os
+import shutil
 import sys
-import pygame
 
 import numpy as np
-import tensorflow.compat.v1 as tf
 
-import ai
 import core
-from render import PygameRenderer
+import parallel
+from env import SnakeEnv, determine_reward, to_move  # noqa: F401
+from recording import GameRecorder
+from instrument import GameProfiler, PhaseTimer
 
 
 def parse_args(args):
     parser = argparse.ArgumentParser()
     parser.add_argument('--size', default=20, type=int, dest='size')
-    parser.add_argument('--display', default='1', type=int, dest='display')
+    parser.add_argument('--display', default='1', type=int, dest='display',
+                        help='Show one game out of every DISPLAY. 0 trains headless without loading pygame.')
     parser.add_argument('--count', default=10, type=int, dest='count')
     parser.add_argument('--init-dir', default='left', dest='init_dir', choices=['up', 'down', 'left', 'right'])
     parser.add_argument('--speed', default=2, type=int, dest='speed')
+    parser.add_argument('--workers', default=0, type=int, dest='workers',
+                        help='Number of processes playing games in parallel. 0 trains in this process.')
+    parser.add_argument('--target-update', default=None, type=int, dest='target_update',
+                        help='Bootstrap from a target network copied from the model every TARGET_UPDATE fits.')
+    parser.add_argument('--tau', default=None, type=float, dest='tau',
+                        help='Bootstrap from a target network moved TAU of the way towards the model after every fit.')
+    parser.add_argument('--double', action='store_true', dest='double',
+                        help='Use double DQN targets. Requires --target-update or --tau.')
+    parser.add_argument('--checkpoint-dir', default=None, dest='checkpoint_dir',
+                        help='Directory to save a checkpoint to at the end of training, and every CHECKPOINT_EVERY '
+                             'games.')
+    parser.add_argument('--checkpoint-every', default=0, type=int, dest='checkpoint_every',
+                        help='Number of games between checkpoints. 0 only saves at the end.')
+    parser.add_argument('--checkpoint-memory', action='store_true', dest='checkpoint_memory',
+                        help='Include the replay memory in checkpoints.')
+    parser.add_argument('--resume', default=None, dest='resume',
+                        help='Continue training from the checkpoint in this directory, up to COUNT games in total.')
+    parser.add_argument('--record', default=None, dest='record',
+                        help='Append every game played in this process to the recording at this path.')
+    parser.add_argument('--stats-every', default=10, type=int, dest='stats_every',
+                        help='Print a breakdown of where training time went every STATS_EVERY games. 0 disables it.')
+    parser.add_argument('--profile-games', default=[], type=int, nargs='*', dest='profile_games',
+                        help='Numbers of the games to run under cProfile.')
+    parser.add_argument('--profile-dir', default='.', dest='profile_dir',
+                        help='Directory the profiles from --profile-games are written to.')
+
+    parsed = parser.parse_args(args)
+    if parsed.workers > 0 and (parsed.record or parsed.profile_games):
+        parser.error('--record and --profile-games only apply to games played in this process, not with --workers')
+    return parsed
 
-    return parser.parse_args(args)
 
+def reshape(matrix):
+    # The input must be re-wrapped into a numpy array to be recognized correctly.
+    return matrix.reshape((1, -1))
 
-def determine_reward(playable, min_distance, has_eaten):
-    """Determines a reward in the range [-1, 1]. Eating returns 1, while dying returns -1. Any other rewards are based
-    on the distance to the nearest food item.
-
-    :param playable boolean determining whether or not the new state is playable.
-    :param min_distance a value in [0, 1) determining how close the nearest food item is.
-    :param has_eaten a boolean determining whether or not the previous move resulted in eating."""
-    # Punish game over.
-    if not playable:
-        return -10
-    elif has_eaten:
-        return 10
-
-    return -min_distance
 
+def checkpoint(agent, directory, game, high_score, memory=False):
+    """Save the agent to `directory`, replacing any earlier checkpoint only once the new one is completely written."""
+    partial = directory.rstrip(os.sep) + '.partial'
+    shutil.rmtree(partial, ignore_errors=True)
+    agent.save(partial, memory=memory, game=game, high_score=high_score)
 
-def to_move(move, facing):
-    """Determines the absolute direction of motion given a relative movement and facing direction.
-    :param move an integer corresponding to the relative motion of the snake.
-        - 0 is straight.
-        - 1 is left.
-        - 2 is right
-        Other values are considered to be undefined.
-    :param facing one of UP, DOWN, LEFT, or RIGHT from the `snake_ai.core` module.
-    :returns the absolute direction after applying the given relative motion."""
-    if move == 0:
-        return facing
-    elif move == 1:
-        x, y = facing
-        return np.array([y, -x])  # Left rotation
-    elif move == 2:
-        x, y = facing
-        return np.array([-y, x])  # Right rotation
+    if os.path.exists(directory):
+        old = directory.rstrip(os.sep) + '.old'
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(directory, old)
+        os.rename(partial, directory)
+        shutil.rmtree(old)
+    else:
+        os.rename(partial, directory)
 
 
-def reshape(matrix):
-    # The input must be re-wrapped into a numpy array to be recognized correctly.
-    return matrix.reshape((1, -1))
+def main(args=None):
+    # The agent and TensorFlow are only loaded here, so that worker processes can import the helpers above without them.
+    import tensorflow.compat.v1 as tf
 
+    import ai
 
-def main(args=None):
     # Suppress all non-vital tensorflow warnings.
     tf.logging.set_verbosity(tf.logging.ERROR)
 
@@ -83,70 +101,138 @@ def main(args=None):
     moves_per_second = args.speed
     max_drought = length * width
 
-    clock = pygame.time.Clock()
-
+    # Nothing display related is loaded when training headless, keeping pygame out of startup and the step loop.
     renderer = None
+    viewer = None
     if games_shown != 0:
+        from render import PygameRenderer
+        from runner import GameRunner, PygameControls, TimeSlice, Viewer
+
         renderer = PygameRenderer(length, width, 20)
+        viewer = Viewer(GameRunner(renderer, PygameControls(), moves_per_second))
+        time_slice = TimeSlice()
 
     # TODO(matthew-c21): This value changes in response to state.food_max.
-    agent = ai.DefaultAgent((8,), epsilon=0.5, gamma=0.95)
-
-    facing = init_dir
+    agent = ai.DefaultAgent((8,), epsilon=0.5, gamma=0.95, target_update=args.target_update, tau=args.tau,
+                            double=args.double)
 
+    first_game = 1
     high_score = 0
+    if args.resume:
+        meta = agent.restore(args.resume)
+        first_game = meta['game'] + 1
+        high_score = meta['high_score']
+        print('Resuming from game %d of %s' % (meta['game'], args.resume))
+
+    timer = PhaseTimer()
+
+    def finish_game(i, high_score):
+        """Print phase statistics and save a checkpoint where due once game `i` has been trained on."""
+        if args.stats_every and i % args.stats_every == 0:
+            print(timer.summary({'predict calls': getattr(agent, 'predict_calls', 0),
+                                 'fit calls': getattr(agent, 'fit_calls', 0)}))
+
+        if args.checkpoint_dir and (i == n or args.checkpoint_every and i % args.checkpoint_every == 0):
+            checkpoint(agent, args.checkpoint_dir, i, high_score, args.checkpoint_memory)
+
+    if args.workers > 0:
+        def on_game(i, score, steps):
+            nonlocal high_score
+            high_score = max(high_score, score)
+            timer.end_game(steps)
+            finish_game(i, high_score)
+
+        parallel.train(agent, (8,), args.workers, n - first_game + 1, length, width, init_dir, max_drought,
+                       first_game=first_game, on_game=on_game)
+        handle_game_over(high_score)
+        return
+
+    recorder = GameRecorder(args.record) if args.record else None
+    env = SnakeEnv(length, width, init_dir, max_drought=max_drought, recorder=recorder)
+    profiler = GameProfiler(args.profile_games, args.profile_dir)
+    # Checked once, since formatting a log line on every move is wasted work when the level filters it out.
+    log_moves = logging.getLogger().isEnabledFor(logging.INFO)
 
     # TODO(matthew-c21): Try to add replay for best game in set to see whether or not the AI has actually improved, or
     #  if the result was a fluke. Consider storing more than one game if only the first (and / or second) best instances
     #  were accidental.
 
-    # TODO(matthew-c21): Add option to save weights at end of training, or to load weights at start.
-    for i in range(1, n + 1):  # Number games from 1 to simplify math.
-        rendering = games_shown != 0 and i % games_shown == 0
-
-        snake = core.Snake((width // 2 + 1, length // 2 + 1), 1, init_dir)
-        state = core.GameState(snake, length, width, max_drought=max_drought, food_max=1)
-
-        print('Game: %d, ' % i, end='')
-        logging.info('Starting game ' + str(i))
+    # Shown games are played at full speed like any other, then handed to the viewer, which replays them at human speed
+    # in between training steps while training carries on.
+    async def train(high_score):
+        for i in range(first_game, n + 1):  # Number games from 1 to simplify math.
+            if viewer is not None and viewer.closed:
+                break
+            rendering = viewer is not None and i % games_shown == 0
+
+            print('Game: %d, ' % i, end='')
+            logging.info('Starting game ' + str(i))
+
+            profiler.start(i)
+            steps = 0
+            # Each observation is encoded once, serving as the new state of one move and the old state of the next.
+            with timer.phase('step'):
+                new_state = reshape(env.reset())
+            state = env.state
+            done = False
+            if rendering:
+                initial_state = state.copy()
+                moves = []
 
-        while state.is_playable():
-            old_state = reshape(state.get_primitive_state_vector())
+            while not done:
+                old_state = new_state
 
-            action = agent.make_choice(old_state)
+                with timer.phase('make_choice'):
+                    action = agent.make_choice(old_state)
 
-            move = to_move(action, facing)
-            facing = move
-            has_eaten = state.update(move)
+                with timer.phase('step'):
+                    obs, reward, done, _ = env.step(action)
+                    new_state = reshape(obs)
+                steps += 1
 
-            new_state = reshape(state.get_primitive_state_vector())
-            scaled_distance = 0  # (1 - distance(snake.head().pos, state.food_items[0].pos)) / max_drought
-            reward = determine_reward(state.is_playable(), scaled_distance, has_eaten)
+                if log_moves:
+                    logging.info('Reward for move %d: %f', action, reward)
 
-            logging.info('Reward for move %d: %f' % (action, reward))
+                with timer.phase('train_short_memory'):
+                    agent.train_short_memory(old_state, action, reward, new_state, done)
+                with timer.phase('remember'):
+                    agent.remember(old_state, action, reward, new_state, done)
 
-            agent.train_short_memory(old_state, action, reward, new_state, state.is_playable())
-            agent.remember(old_state, action, reward, new_state, state.is_playable())
+                if viewer is not None:
+                    if rendering:
+                        moves.append(core.direction_index(state.prev_move))
+                    with timer.phase('render'):
+                        await time_slice.pause()
 
             if rendering:
-                frame_count = 0
-                while frame_count < (60 / moves_per_second):
-                    for event in pygame.event.get():
-                        if event.type == pygame.QUIT:
-                            pygame.quit()
-                            renderer.close()
-                            handle_game_over(high_score)
-                            sys.exit(0)
-                    frame_count += 1
-                    renderer.render(state)
-                    clock.tick(60)
-            elif renderer is not None:
-                renderer.clear()
-
-        print('Score: %d' % state.get_score())
-        agent.replay_new()
-        high_score = max(high_score, state.get_score())
-
+                viewer.offer(initial_state, moves)
+
+            print('Score: %d' % state.get_score())
+            with timer.phase('replay_new'):
+                agent.replay_new()
+            high_score = max(high_score, state.get_score())
+
+            profile = profiler.stop()
+            if profile is not None:
+                print('Wrote profile of game %d to %s' % (i, profile))
+
+            game_times = timer.end_game(steps)
+            if log_moves:
+                logging.info('Game %d phase times: %s', i, game_times)
+            finish_game(i, high_score)
+
+        return high_score
+
+    # The recorder is closed however training stops, so that the game in progress is ended rather than left unfinished.
+    try:
+        if viewer is None:
+            high_score = asyncio.run(train(high_score))
+        else:
+            high_score = asyncio.run(viewer.alongside(train(high_score)))
+            renderer.close()
+    finally:
+        if recorder is not None:
+            recorder.close()
     handle_game_over(high_score)
 
 
@@ -0,0 +1,161 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import snake_ai.ai as ai
+
+
+class Optimizer:
+    """Stands in for a Keras optimizer, whose slots only exist after the first update."""
+
+    def __init__(self):
+        self.weights = []
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights]
+
+    def set_weights(self, weights):
+        self.weights = [np.array(w) for w in weights]
+
+
+class Model:
+    """Stands in for the Keras network: a single dense layer with a softmax output. Fitting records its arguments and
+    leaves the weights alone, so every target is computed from the same network."""
+
+    def __init__(self, input_dim, seed=0):
+        rng = np.random.RandomState(seed)
+        self.weights = [rng.normal(scale=0.5, size=(input_dim[0], 3)).astype(np.float32),
+                        rng.normal(scale=0.1, size=3).astype(np.float32)]
+        self.optimizer = Optimizer()
+        self.fits = []
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights]
+
+    def set_weights(self, weights):
+        self.weights = [np.array(w, dtype=np.float32) for w in weights]
+
+    def predict(self, states):
+        x = np.asarray(states, dtype=np.float32).reshape((-1, self.weights[0].shape[0])) @ self.weights[0]
+        x += self.weights[1]
+        x = np.exp(x - x.max(axis=1, keepdims=True))
+        return x / x.sum(axis=1, keepdims=True)
+
+    def fit(self, states, targets, epochs=1, verbose=0, sample_weight=None):
+        self.fits.append((np.array(states), np.array(targets), sample_weight))
+
+    def train_on_batch(self, states, targets, sample_weight=None):
+        if not self.optimizer.weights:
+            self.optimizer.weights = [np.zeros_like(w) for w in self.weights]
+
+
+def fake_network(learning_rate, input_dim, output_dim=120, weights=None):
+    model = Model(input_dim)
+    if weights:
+        model.set_weights(ai.load_weights(weights))
+    return model
+
+
+@mock.patch.object(ai.DefaultAgent, '_network', staticmethod(fake_network))
+class DefaultAgentTest(unittest.TestCase):
+    def _transitions(self, count, seed=1):
+        rng = np.random.RandomState(seed)
+        states = rng.randint(2, size=(count, 8)).astype(np.float32)
+        next_states = rng.randint(2, size=(count, 8)).astype(np.float32)
+        return states, rng.randint(3, size=count), rng.normal(size=count).astype(np.float32), next_states, \
+            rng.rand(count) < 0.3
+
+    def _check_batch_matches_single(self, **kwargs):
+        states, actions, rewards, next_states, done = self._transitions(16)
+        agent = ai.DefaultAgent((8,), gamma=0.9, **kwargs)
+
+        for transition in zip(states, actions, rewards, next_states, done):
+            agent.train_short_memory(*(np.reshape(x, (1, -1)) if np.ndim(x) else x for x in transition))
+        single = np.vstack([targets for _, targets, _ in agent.model.fits])
+
+        agent.model.fits = []
+        agent._train_batch(states, actions, rewards, next_states, done)
+        _, batch, _ = agent.model.fits[0]
+        np.testing.assert_allclose(single, batch, rtol=1e-5)
+
+    def test_batch_targets_match_single_updates(self):
+        self._check_batch_matches_single()
+
+    def test_batch_targets_match_single_updates_with_target_network(self):
+        self._check_batch_matches_single(target_update=100, double=True)
+
+    def test_non_terminal_target_bootstraps_from_target_network(self):
+        agent = ai.DefaultAgent((8,), gamma=0.9, target_update=100)
+        # Move the target network away from the model, so that using the wrong one shows up.
+        agent.target.set_weights([w + 1 for w in agent.dump_weights()])
+        states, actions, rewards, next_states, _ = self._transitions(4)
+        done = np.array([False, True, False, True])
+
+        errors = agent._train_batch(states, actions, rewards, next_states, done)
+        _, targets, _ = agent.model.fits[0]
+        expected = rewards + np.where(done, 0, 0.9 * agent.target.predict(next_states).max(axis=1))
+        np.testing.assert_allclose(expected, targets[np.arange(4), actions], rtol=1e-5)
+        np.testing.assert_allclose(expected - agent.model.predict(states)[np.arange(4), actions], errors, rtol=1e-5)
+
+        agent.model.fits = []
+        agent.train_short_memory(states[:1], actions[0], rewards[0], next_states[:1], False)
+        _, targets, _ = agent.model.fits[0]
+        self.assertAlmostEqual(expected[0], targets[0, actions[0]], places=5)
+
+    def test_double_values_model_choice_with_target(self):
+        agent = ai.DefaultAgent((8,), gamma=0.9, tau=0.5, double=True)
+        agent.target.set_weights([w * -1 for w in agent.dump_weights()])
+        next_states = self._transitions(8)[3]
+
+        chosen = agent.model.predict(next_states).argmax(axis=1)
+        expected = agent.target.predict(next_states)[np.arange(8), chosen]
+        np.testing.assert_allclose(expected, agent._next_values(next_states), rtol=1e-5)
+
+    def test_target_updates(self):
+        agent = ai.DefaultAgent((8,), target_update=2)
+        states = np.zeros((1, 8))
+        agent.model.set_weights([w + 1 for w in agent.dump_weights()])
+
+        agent._fit(states, np.zeros((1, 3)))
+        self.assertFalse(np.allclose(agent.dump_weights()[0], agent.target.get_weights()[0]))
+        agent._fit(states, np.zeros((1, 3)))
+        np.testing.assert_allclose(agent.dump_weights()[0], agent.target.get_weights()[0])
+
+        agent = ai.DefaultAgent((8,), tau=0.25)
+        old = agent.target.get_weights()[0].copy()
+        agent.model.set_weights([w + 1 for w in agent.dump_weights()])
+        agent._fit(states, np.zeros((1, 3)))
+        np.testing.assert_allclose(old + 0.25, agent.target.get_weights()[0], rtol=1e-5)
+
+    def test_save_and_restore(self):
+        agent = ai.DefaultAgent((8,), epsilon=0.3, target_update=5)
+        agent.set_weights([w * 3 for w in agent.dump_weights()])
+        agent.target.set_weights([w * 2 for w in agent.dump_weights()])
+        agent.model.optimizer.weights = [np.full(3, 7.0)]
+        agent.fit_calls = 12
+        for transition in zip(*self._transitions(5)):
+            agent.remember(*transition)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checkpoint')
+            agent.save(path, memory=True, game=4)
+
+            restored = ai.DefaultAgent((8,), target_update=5)
+            self.assertEqual({'game': 4}, restored.restore(path))
+
+        self.assertEqual(0.3, restored.epsilon)
+        self.assertEqual(12, restored.fit_calls)
+        for expected, actual in zip(agent.dump_weights(), restored.dump_weights()):
+            np.testing.assert_array_equal(expected, actual)
+        for expected, actual in zip(agent.target.get_weights(), restored.target.get_weights()):
+            np.testing.assert_array_equal(expected, actual)
+        np.testing.assert_array_equal([np.full(3, 7.0)], restored.model.optimizer.get_weights())
+        np.testing.assert_array_equal(agent.sync_policy().act(np.eye(8)), restored.sync_policy().act(np.eye(8)))
+        for expected, actual in zip(agent.memory.get(np.arange(5)), restored.memory.get(np.arange(5))):
+            np.testing.assert_array_equal(expected, actual)
+
+
+if __name__ == '__main__':
+    unittest.main()
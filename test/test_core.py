@@ -1,5 +1,6 @@
 import unittest
 from itertools import cycle
+from unittest import mock
 
 import numpy as np
 import snake_ai.core as core
@@ -145,6 +146,34 @@ class CoreTest(unittest.TestCase):
         snake.move(core.UP)
         self.assertTrue(snake.intersects(snake.head().pos, 1))
 
+    def test_snake_intersects_tracks_vacated_cells(self):
+        snake = core.Snake(np.array([3, 3]), 2, core.LEFT)
+        self.assertTrue(snake.intersects(np.array([4, 3])))
+
+        snake.move(core.UP)
+        self.assertFalse(snake.intersects(np.array([4, 3])))
+        self.assertTrue(snake.intersects(np.array([3, 3])))
+        self.assertTrue(snake.intersects(snake.head().pos))
+        self.assertFalse(snake.intersects(snake.head().pos, 1))
+
+    def test_snake_accepts_direction_indices(self):
+        snake = core.Snake(np.array([3, 3]), 2, core.direction_index(core.LEFT))
+        snake.move(core.direction_index(core.UP))
+
+        np.testing.assert_array_equal(core.UP, snake.facing)
+        assert_snake_has_position(snake, [[3, 2], [3, 3]])
+
+    def test_head_and_blocked_neighbours(self):
+        snake = core.Snake(np.array([1, 3]), 3, core.UP)
+        state = core.GameState(snake, 5, 5)
+
+        self.assertEqual(core.direction_index(core.UP), snake.direction)
+        self.assertEqual((1, 3), snake.head_position())
+        self.assertFalse(state.is_blocked(core.UP))
+        self.assertTrue(state.is_blocked(core.DOWN))
+        self.assertTrue(state.is_blocked(core.LEFT))
+        self.assertFalse(state.is_blocked(core.direction_index(core.RIGHT)))
+
     def test_state_becomes_unplayable_on_update(self):
         snake = core.Snake(np.array([2, 1]), 3, core.LEFT)
         state = core.GameState(snake, 5, 5)
@@ -164,6 +193,83 @@ class CoreTest(unittest.TestCase):
         food = state.food()
         self._check_matrix(snake, matrix, food)
 
+    def test_state_matrix_updated_incrementally(self):
+        snake = core.Snake(np.array([5, 5]), 3, core.RIGHT)
+        state = core.GameState(snake, 10, 10, seed=4, food_max=3)
+
+        moves = [core.UP, core.LEFT, core.LEFT, core.DOWN, core.DOWN, core.RIGHT, core.RIGHT, core.UP]
+        for move in moves:
+            state.update(move)
+            state.set_food(state.food()[1:])
+            state.to_matrix()
+            state.update(move)
+
+            expected = state.to_matrix()
+            state._matrix = None
+            np.testing.assert_array_equal(expected, state.to_matrix())
+            self._check_matrix(snake, expected, state.food())
+
+        self.assertTrue(state.is_playable())
+        out = np.empty((11, 11))
+        self.assertIs(out, state.to_matrix(out=out))
+        np.testing.assert_array_equal(state.to_matrix(), out)
+
+    def test_state_matrix_non_square(self):
+        snake = core.Snake(np.array([3, 6]), 2, core.UP)
+        state = core.GameState(snake, 8, 5)
+        matrix = state.to_matrix()
+
+        self.assertEqual((9, 6), matrix.shape)
+        self.assertTrue((matrix[:, [0, 5]] == -1).all())
+        self.assertTrue((matrix[[0, 8], :] == -1).all())
+        self.assertEqual(-100, matrix[7, 3])
+
+    def test_state_matrix_read_only_view(self):
+        snake = core.Snake(np.array([5, 5]), 3, core.RIGHT)
+        state = core.GameState(snake, 10, 10)
+        matrix = state.to_matrix(readonly=True)
+
+        with self.assertRaises(ValueError):
+            matrix[5, 5] = 0
+
+        state.update(core.UP)
+        self.assertEqual(-100, matrix[4, 5])
+
+    def test_state_matrix_read_only_view_follows_new_food(self):
+        snake = core.Snake(np.array([5, 5]), 3, core.RIGHT)
+        state = core.GameState(snake, 10, 10)
+        matrix = state.to_matrix(readonly=True)
+
+        state.set_food([core._food_item(np.array([2, 8]), 1)])
+        self.assertEqual(1, matrix[8, 2])
+
+        state.update(core.UP)
+        self.assertEqual(-100, matrix[4, 5])
+        self.assertEqual(0, matrix[5, 3])
+        np.testing.assert_array_equal(state.to_matrix(), matrix)
+
+    def test_changed_positions(self):
+        snake = core.Snake(np.array([5, 5]), 2, core.RIGHT)
+        # Seeded so that the food placed after eating stays off the snake's path.
+        state = core.GameState(snake, 10, 10, seed=2)
+        state.set_food([core._food_item(np.array([6, 5]), 1)])
+        self.assertIsNone(state.changed_positions())
+
+        state.update(core.RIGHT)
+        changed = {tuple(position) for position in state.changed_positions()}
+        # The new head, the vacated tail, the food eaten, and the food placed in its stead.
+        self.assertEqual({(6, 5), (4, 5), tuple(state.food()[0].pos)}, changed)
+
+        state.update(core.RIGHT)
+        changed = {tuple(position) for position in state.changed_positions()}
+        self.assertEqual({(7, 5), (5, 5)}, changed)
+
+        # The food reaches the tail, which stays put as the snake grows.
+        state.update(core.RIGHT)
+        changed = {tuple(position) for position in state.changed_positions()}
+        self.assertEqual({(8, 5)}, changed)
+        self.assertEqual(4, state.updates)
+
     def test_board_does_not_make_changes_after_game_over(self):
         snake = core.Snake(np.array([1, 1]), 1, core.LEFT)
         state = core.GameState(snake, 5, 5)
@@ -221,7 +327,7 @@ class CoreTest(unittest.TestCase):
     def test_snake_grows_from_state(self):
         # TODO(matthew-c21): Update this to match any changes to the seeding in GameState.
         snake = core.Snake(np.array([5, 5]), 2, core.LEFT)
-        state = core.GameState(snake, 10, 10, seed=10)
+        state = core.GameState(snake, 10, 10, seed=10, legacy_rng=True)
 
         for _ in range(4):
             state.update(core.UP)
@@ -268,7 +374,7 @@ class CoreTest(unittest.TestCase):
 
     def test_food_regenerated_upon_eating(self):
         snake = core.Snake(np.array([5, 5]), 1, core.RIGHT)
-        state = core.GameState(snake, 10, 10, seed=10, food_max=5)
+        state = core.GameState(snake, 10, 10, seed=10, food_max=5, legacy_rng=True)
 
         self.assertEqual(5, len(state.food()))
 
@@ -277,6 +383,32 @@ class CoreTest(unittest.TestCase):
 
         self.assertEqual(5, len(state.food()))
 
+    def test_food_reproducible_from_seed(self):
+        foods = []
+        for _ in range(2):
+            snake = core.Snake(np.array([5, 5]), 1, core.RIGHT)
+            state = core.GameState(snake, 10, 10, seed=3, food_max=3)
+            for move in [core.UP, core.RIGHT, core.RIGHT, core.DOWN]:
+                state.set_food(state.food()[1:])
+                state.update(move)
+            foods.append([food.pos for food in state.food()])
+
+        np.testing.assert_array_equal(foods[0], foods[1])
+
+    def test_update_leaves_global_random_state_alone(self):
+        for legacy_rng in (False, True):
+            np.random.seed(0)
+            expected = np.random.rand()
+
+            np.random.seed(0)
+            snake = core.Snake(np.array([5, 5]), 1, core.RIGHT)
+            state = core.GameState(snake, 10, 10, seed=3, food_max=2, legacy_rng=legacy_rng)
+            for _ in range(4):
+                state.set_food(state.food()[1:])
+                state.update(core.UP)
+
+            self.assertEqual(expected, np.random.rand())
+
     def test_setting_food_items_persistent(self):
         snake = core.Snake(np.array([5, 5]), 1, core.RIGHT)
         state = core.GameState(snake, 10, 10, food_max=5)
@@ -292,6 +424,115 @@ class CoreTest(unittest.TestCase):
         self.assertTrue(all(x is not food for x in state.food()))
         self.assertEqual(5, len(state.food()))
 
+    def test_food_placed_on_last_free_cell(self):
+        for seed in range(10):
+            snake = core.Snake(np.array([2, 1]), 2, core.RIGHT)
+            state = core.GameState(snake, 2, 4, seed=seed)
+            np.testing.assert_array_equal([3, 1], state.food()[0].pos)
+
+    def test_game_won_when_board_is_full(self):
+        snake = core.Snake(np.array([2, 1]), 2, core.LEFT)
+        state = core.GameState(snake, 2, 3, seed=1)
+        self.assertFalse(state.is_won())
+
+        self.assertTrue(state.update(core.LEFT))
+        self.assertTrue(state.is_won())
+        self.assertFalse(state.is_playable())
+
+
+class BatchGameStateTest(unittest.TestCase):
+    def _check_against_scalar(self, count, length, width, init_length, food_max, max_drought, steps,
+                              legacy_rng=False):
+        seeds = np.arange(count) * 7 + 3
+        batch = core.BatchGameState(count, length, width, (width // 2, length // 2), init_length, core.LEFT,
+                                    food_max=food_max, seeds=seeds, max_drought=max_drought, legacy_rng=legacy_rng)
+        states = [core.GameState(core.Snake(np.array([width // 2, length // 2]), init_length, core.LEFT), length, width,
+                                 food_max=food_max, seed=int(seed), max_drought=max_drought, legacy_rng=legacy_rng)
+                  for seed in seeds]
+
+        directions = np.array([core.UP, core.DOWN, core.LEFT, core.RIGHT])
+        moves = np.random.RandomState(1).randint(4, size=(steps, count))
+
+        for step in moves:
+            has_eaten = batch.step(directions[step])
+            for game, state in enumerate(states):
+                self.assertEqual(state.update(directions[step[game]]), has_eaten[game])
+                self.assertEqual(state.is_playable(), batch.is_playable()[game])
+                self.assertEqual(state.get_score(), batch.get_scores()[game])
+                np.testing.assert_array_equal([part.pos for part in state.snake], batch.snake(game))
+                np.testing.assert_array_equal([food.pos for food in state.food()], batch.food(game))
+                self.assertEqual(state.snake.direction, batch.facing_index[game])
+                self.assertEqual(core.direction_index(state.prev_move), batch.prev_move_index[game])
+
+    def test_batch_matches_scalar_games(self):
+        self._check_against_scalar(16, 8, 8, 3, 1, 20, 150)
+
+    def test_batch_matches_scalar_games_with_multiple_food(self):
+        self._check_against_scalar(8, 6, 9, 2, 4, np.Inf, 100)
+
+    def test_batch_matches_legacy_scalar_games(self):
+        self._check_against_scalar(16, 8, 8, 3, 1, 20, 150, legacy_rng=True)
+        self._check_against_scalar(8, 6, 9, 2, 4, np.Inf, 100, legacy_rng=True)
+
+    def test_batch_matches_scalar_free_cell_order(self):
+        # Skip the rejection draws entirely so every food item comes from the free cell index.
+        with mock.patch.object(core, '_FOOD_ATTEMPTS', 0):
+            self._check_against_scalar(16, 6, 7, 4, 2, 20, 150, legacy_rng=True)
+
+    def test_batch_direction_indices_reset(self):
+        batch = core.BatchGameState(2, 8, 8, (4, 4), 1, core.LEFT, seeds=[1, 2])
+        np.testing.assert_array_equal([-1, -1], batch.prev_move_index)
+
+        batch.step([core.direction_index(core.UP), core.direction_index(core.DOWN)])
+        np.testing.assert_array_equal([0, 2], batch.facing_index)
+        np.testing.assert_array_equal([0, 2], batch.prev_move_index)
+
+        batch.reset([1], seeds=[3])
+        np.testing.assert_array_equal([0, 3], batch.facing_index)
+        np.testing.assert_array_equal([0, -1], batch.prev_move_index)
+
+    def test_batch_game_won_when_board_is_full(self):
+        batch = core.BatchGameState(1, 2, 3, (2, 1), 2, core.LEFT, seeds=[1])
+        batch.step([core.LEFT])
+
+        np.testing.assert_array_equal([True], batch.is_won())
+        np.testing.assert_array_equal([False], batch.is_playable())
+
+    def test_batch_does_not_change_after_game_over(self):
+        batch = core.BatchGameState(2, 5, 5, (1, 1), 1, core.LEFT, seeds=[1, 2])
+        batch.step([core.LEFT, core.DOWN])
+        np.testing.assert_array_equal([False, True], batch.is_playable())
+
+        for _ in range(3):
+            batch.step([core.LEFT, core.LEFT])
+
+        np.testing.assert_array_equal([[0, 1]], batch.snake(0))
+
+    def test_batch_snake_grows(self):
+        batch = core.BatchGameState(1, 10, 10, (5, 5), 2, core.LEFT, seeds=[10], legacy_rng=True)
+
+        for move in [core.UP] * 4 + [core.LEFT] * 2:
+            batch.step([core.direction_index(move)])
+
+        self.assertEqual(3, len(batch.snake(0)))
+
+    def test_batch_reset_matches_new_games(self):
+        batch = core.BatchGameState(6, 8, 8, (4, 4), 3, core.LEFT, seeds=np.arange(6))
+        moves = np.random.RandomState(2).randint(4, size=(30, 6))
+        for step in moves:
+            batch.step(step)
+
+        batch.reset([1, 4], seeds=[11, 14])
+        fresh = core.BatchGameState(6, 8, 8, (4, 4), 3, core.LEFT, seeds=np.arange(6) + 10)
+        for step in moves:
+            np.testing.assert_array_equal(fresh.step(step)[[1, 4]], batch.step(step)[[1, 4]])
+
+        for game in (1, 4):
+            self.assertEqual(fresh.is_playable()[game], batch.is_playable()[game])
+            self.assertEqual(fresh.get_scores()[game], batch.get_scores()[game])
+            np.testing.assert_array_equal(fresh.snake(game), batch.snake(game))
+            np.testing.assert_array_equal(fresh.food(game), batch.food(game))
+
 
 if __name__ == '__main__':
     unittest.main()
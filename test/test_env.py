@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+import snake_ai.core as core
+import snake_ai.env as env
+import snake_ai.features as features
+
+
+class MoveTest(unittest.TestCase):
+    def test_to_moves_matches_to_move(self):
+        for facing, direction in enumerate(core.DIRECTIONS):
+            for move in range(3):
+                expected = core.direction_index(env.to_move(move, direction))
+                self.assertEqual(expected, env.to_moves([move], [facing])[0])
+
+    def test_rewards_match_determine_reward(self):
+        for playable, has_eaten, won in [(False, False, False), (False, True, False), (True, False, False),
+                                         (True, True, False), (False, True, True)]:
+            self.assertEqual(env.determine_reward(playable, 0, has_eaten, won),
+                             env.determine_rewards(np.array([playable]), np.array([has_eaten]), np.array([won]))[0])
+
+    def test_winning_is_rewarded(self):
+        self.assertGreater(env.determine_reward(False, 0, True, True), env.determine_reward(True, 0, True))
+        self.assertGreater(env.determine_reward(False, 0, True, True), env.determine_reward(False, 0, False))
+
+
+class SnakeEnvTest(unittest.TestCase):
+    def test_step_until_done(self):
+        game = env.SnakeEnv(10, 10, core.LEFT, seed=0)
+        obs = game.reset()
+        np.testing.assert_array_equal(game.state.get_primitive_state_vector(), obs)
+
+        done = False
+        steps = 0
+        while not done:
+            obs, reward, done, info = game.step(0)
+            steps += 1
+
+        # Going straight from the middle of the board runs into the left wall.
+        self.assertEqual(6, steps)
+        self.assertEqual(-10, reward)
+        self.assertFalse(game.state.is_playable())
+        self.assertEqual(game.state.get_score(), info['score'])
+
+    def test_win_is_not_a_death(self):
+        # Turning right on every move circles the four cells of a 3 x 3 board until they are all taken.
+        game = env.SnakeEnv(3, 3, core.LEFT, seed=0)
+        game.reset()
+        obs, reward, done, info = game.step(0)
+        while not done:
+            obs, reward, done, info = game.step(2)
+
+        self.assertTrue(info['won'])
+        self.assertEqual(100, reward)
+
+    def test_reset_starts_over(self):
+        game = env.SnakeEnv(10, 10, core.LEFT, seed=0)
+        game.reset()
+        game.step(1)
+        game.reset(seed=3)
+        self.assertEqual(3, game.state.seed)
+        np.testing.assert_array_equal(core.LEFT, game.state.snake.facing)
+
+
+class SnakeVecEnvTest(unittest.TestCase):
+    def test_matches_single_games(self):
+        vec = env.SnakeVecEnv(4, 8, 8, core.LEFT, max_drought=30, seed=0)
+        obs = vec.reset()
+        games = [env.SnakeEnv(8, 8, core.LEFT, max_drought=30) for _ in range(4)]
+        for game, seed in enumerate(vec.batch.seeds):
+            np.testing.assert_array_equal(games[game].reset(seed=int(seed)), obs[game])
+
+        actions = np.random.RandomState(0).randint(3, size=(20, 4))
+        for step in actions:
+            obs, rewards, done, info = vec.step(step)
+            for game, single in enumerate(games):
+                if single.state.is_playable():
+                    expected, reward, ended, _ = single.step(step[game])
+                    self.assertEqual(ended, done[game])
+                    self.assertEqual(reward, rewards[game])
+                    np.testing.assert_array_equal(expected, info['terminal_observation'][game])
+
+    def test_finished_games_restart(self):
+        vec = env.SnakeVecEnv(3, 8, 8, core.LEFT, seed=0)
+        vec.reset()
+        seeds = vec.batch.seeds.copy()
+
+        for _ in range(5):
+            obs, rewards, done, info = vec.step(np.zeros(3, dtype=int))
+
+        # Every snake runs into the wall on the same move, and is replaced by a new game.
+        np.testing.assert_array_equal([True] * 3, done)
+        np.testing.assert_array_equal([-10] * 3, rewards)
+        self.assertTrue(vec.batch.is_playable().all())
+        self.assertFalse((vec.batch.seeds == seeds).any())
+        np.testing.assert_array_equal(features.encode(vec.batch), obs)
+
+    def test_win_is_not_a_death(self):
+        vec = env.SnakeVecEnv(1, 3, 3, core.LEFT, seed=0)
+        vec.reset()
+        obs, rewards, done, info = vec.step([0])
+        while not done.any():
+            obs, rewards, done, info = vec.step([2])
+
+        np.testing.assert_array_equal([True], info['won'])
+        np.testing.assert_array_equal([100], rewards)
+        self.assertFalse(vec.batch.is_won().any())
+
+
+class SubprocVecEnvTest(unittest.TestCase):
+    def test_matches_in_process(self):
+        actions = np.random.RandomState(0).randint(3, size=(10, 5))
+        seeds = np.random.SeedSequence(0).generate_state(2)
+        local = [env.SnakeVecEnv(3, 8, 8, core.LEFT, seed=int(seeds[0])),
+                 env.SnakeVecEnv(2, 8, 8, core.LEFT, seed=int(seeds[1]))]
+
+        with env.SubprocVecEnv(5, 2, seed=0, length=8, width=8, init_dir=core.LEFT) as vec:
+            np.testing.assert_array_equal(np.concatenate([part.reset() for part in local]), vec.reset())
+            for step in actions:
+                obs, rewards, done, info = vec.step(step)
+                expected = [part.step(moves) for part, moves in zip(local, np.split(step, [3]))]
+                np.testing.assert_array_equal(np.concatenate([part[0] for part in expected]), obs)
+                np.testing.assert_array_equal(np.concatenate([part[1] for part in expected]), rewards)
+                np.testing.assert_array_equal(np.concatenate([part[3]['score'] for part in expected]), info['score'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+
+import numpy as np
+
+import snake_ai.core as core
+import snake_ai.features as features
+
+
+def random_games(count, seed, length=10, width=10):
+    """Play `count` games with random moves.
+
+    :returns every state reached, as a list of copies."""
+    rng = np.random.RandomState(seed)
+    states = []
+    for game in range(count):
+        snake = core.Snake(np.array([width // 2, length // 2]), 3, core.LEFT)
+        state = core.GameState(snake, length, width, seed=game)
+        states.append(state.copy())
+        while state.is_playable():
+            state.update(core.DIRECTIONS[rng.randint(4)])
+            states.append(state.copy())
+    return states
+
+
+class PrimitiveFeaturesTest(unittest.TestCase):
+    def test_matches_existing_encoder(self):
+        for state in random_games(20, 0) + random_games(10, 1, length=7, width=12):
+            expected = state.get_primitive_state_vector()
+
+            actual = features.primitive_vector(state)
+            self.assertEqual(np.float32, actual.dtype)
+            np.testing.assert_array_equal(expected, actual)
+            np.testing.assert_array_equal(expected, features.encode(state)[0])
+
+    def test_writes_into_batch_row(self):
+        states = random_games(3, 2)[:5]
+        out = np.full((5, 8), -1, dtype=np.float32)
+        for i, state in enumerate(states):
+            self.assertIs(out[i].base, features.primitive_vector(state, out=out[i]).base)
+
+        np.testing.assert_array_equal([state.get_primitive_state_vector() for state in states], out)
+
+    def test_won_game_without_food(self):
+        snake = core.Snake(np.array([2, 2]), 1, core.LEFT)
+        state = core.GameState(snake, 3, 3, seed=0)
+        # Circle the four cells of the board until they are all taken.
+        for move in [core.LEFT, core.UP, core.RIGHT, core.DOWN] * 4:
+            if not state.is_playable():
+                break
+            state.update(move)
+
+        self.assertTrue(state.is_won())
+        self.assertEqual([], state.food_items)
+        vector = features.primitive_vector(state)
+        np.testing.assert_array_equal([0, 0], vector[:2])
+        np.testing.assert_array_equal(vector, features.encode(state)[0])
+
+    def test_batch_matches_existing_encoder(self):
+        count = 16
+        batch = core.BatchGameState(count, 10, 10, (5, 5), 3, core.LEFT, seeds=np.arange(count))
+        games = [core.GameState(core.Snake(np.array([5, 5]), 3, core.LEFT), 10, 10, seed=i) for i in range(count)]
+        rng = np.random.RandomState(3)
+
+        for _ in range(40):
+            playable = batch.is_playable()
+            encoded = features.encode(batch)
+            for i in np.flatnonzero(playable):
+                np.testing.assert_array_equal(games[i].get_primitive_state_vector(), encoded[i])
+
+            moves = rng.randint(4, size=count)
+            batch.step(moves)
+            for i in np.flatnonzero(playable):
+                games[i].update(moves[i])
+
+
+class RicherFeaturesTest(unittest.TestCase):
+    def setUp(self):
+        # A snake heading up along the left wall with food down and to its right.
+        snake = core.Snake(np.array([1, 3]), 3, core.UP)
+        self.state = core.GameState(snake, 10, 10)
+        self.state.set_food([core._food_item(np.array([4, 7]), 1)])
+
+    def test_danger(self):
+        danger = features.encode(self.state, ['danger'])[0]
+        # Clockwise from ahead: ahead, ahead right, right, behind right, behind, behind left, left, ahead left.
+        np.testing.assert_array_equal([0, 0, 0, 0, 1, 1, 1, 1], danger)
+
+    def test_food_direction(self):
+        food = features.encode(self.state, ['food_direction'])[0]
+        np.testing.assert_allclose([-0.4, 0.3, 0, 1], food)
+
+    def test_body_rays(self):
+        rays = features.encode(self.state, ['body_rays'])[0]
+        # Two free cells ahead, none to the left, and eight to the right.
+        np.testing.assert_allclose(np.array([2, 0, 8]) / 10, rays)
+
+    def test_encoders_side_by_side(self):
+        names = ['primitive', 'body_rays', 'danger']
+        out = np.zeros((1, features.size(names)), dtype=np.float32)
+        features.encode(self.state, names, out=out)
+
+        np.testing.assert_array_equal(self.state.get_primitive_state_vector(), out[0, :8])
+        np.testing.assert_allclose(features.encode(self.state, ['body_rays'])[0], out[0, 8:11])
+        np.testing.assert_array_equal(features.encode(self.state, ['danger'])[0], out[0, 11:])
+
+    def test_batch_agrees_with_single_games(self):
+        count = 8
+        batch = core.BatchGameState(count, 12, 9, (4, 4), 2, core.RIGHT, seeds=np.arange(count))
+        games = [core.GameState(core.Snake(np.array([4, 4]), 2, core.RIGHT), 12, 9, seed=i) for i in range(count)]
+        rng = np.random.RandomState(4)
+        names = list(features.ENCODERS)
+
+        for _ in range(10):
+            moves = rng.randint(4, size=count)
+            playable = batch.is_playable()
+            batch.step(moves)
+            for i in np.flatnonzero(playable):
+                games[i].update(moves[i])
+
+            encoded = features.encode(batch, names)
+            for i in np.flatnonzero(batch.is_playable()):
+                np.testing.assert_allclose(features.encode(games[i], names)[0], encoded[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+import snake_ai.instrument as instrument
+
+
+class PhaseTimerTest(unittest.TestCase):
+    def test_game_and_run_totals(self):
+        timer = instrument.PhaseTimer()
+
+        for _ in range(3):
+            with timer.phase('step'):
+                pass
+        with timer.phase('fit'):
+            pass
+
+        game = timer.end_game(3)
+        self.assertEqual(3, game['step'][1])
+        self.assertEqual(1, game['fit'][1])
+
+        with timer.phase('step'):
+            pass
+        self.assertEqual(1, timer.end_game(1)['step'][1])
+
+        self.assertEqual(4, timer.run['step'][1])
+        self.assertEqual(4, timer.run_steps)
+        self.assertEqual(2, timer.run_games)
+
+    def test_summary_covers_window_since_last_summary(self):
+        timer = instrument.PhaseTimer()
+        with timer.phase('step'):
+            pass
+        timer.end_game(1)
+
+        summary = timer.summary({'predict calls': 5})
+        self.assertIn('1 steps', summary)
+        self.assertIn('predict calls', summary)
+
+        timer.end_game(2)
+        summary = timer.summary({'predict calls': 5})
+        self.assertIn('2 steps', summary)
+        self.assertIn('0 calls', summary)
+
+
+class GameProfilerTest(unittest.TestCase):
+    def test_only_selected_games_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = instrument.GameProfiler([2], directory)
+
+            profiler.start(1)
+            self.assertIsNone(profiler.stop())
+
+            profiler.start(2)
+            sum(range(100))
+            path = profiler.stop()
+            self.assertEqual(os.path.join(directory, 'profile_game_2.prof'), path)
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import snake_ai.memory as memory
+
+
+class ReplayBufferTest(unittest.TestCase):
+    def _fill(self, buffer, count):
+        for i in range(count):
+            buffer.add(np.full((1, 3), i), i % 3, float(i), np.full((1, 3), i + 1), i % 2 == 0)
+
+    def test_add_and_sample(self):
+        buffer = memory.ReplayBuffer(10, (3,), seed=0)
+        self._fill(buffer, 4)
+        self.assertEqual(4, len(buffer))
+
+        states, actions, rewards, next_states, done = buffer.sample(10)
+        self.assertEqual((4, 3), states.shape)
+        self.assertEqual(list(range(4)), sorted(rewards))
+        np.testing.assert_array_equal(states[:, 0] + 1, next_states[:, 0])
+        np.testing.assert_array_equal(rewards.astype(int) % 3, actions)
+        np.testing.assert_array_equal(rewards.astype(int) % 2 == 0, done)
+
+    def test_oldest_transitions_overwritten(self):
+        buffer = memory.ReplayBuffer(5, (3,), seed=0)
+        self._fill(buffer, 12)
+
+        self.assertEqual(5, len(buffer))
+        self.assertEqual(list(range(7, 12)), sorted(buffer.sample(5)[2]))
+
+    def test_sample_is_distinct(self):
+        buffer = memory.ReplayBuffer(100, (3,), seed=0)
+        self._fill(buffer, 100)
+
+        rewards = buffer.sample(50)[2]
+        self.assertEqual(50, len(set(rewards)))
+
+    def test_save_and_load(self):
+        buffer = memory.ReplayBuffer(5, (3,), seed=0)
+        self._fill(buffer, 7)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'buffer')
+            buffer.save(path)
+
+            for mmap_mode in (None, 'r+'):
+                loaded = memory.ReplayBuffer.load(path, mmap_mode=mmap_mode)
+                self.assertEqual(len(buffer), len(loaded))
+                for expected, actual in zip(buffer.get(np.arange(5)), loaded.get(np.arange(5))):
+                    np.testing.assert_array_equal(expected, actual)
+
+                loaded.add(np.zeros(3), 0, 100.0, np.zeros(3), True)
+                self.assertIn(100.0, loaded.sample(5)[2])
+                del loaded
+
+    def test_consecutive_states_are_shared(self):
+        buffer = memory.ReplayBuffer(10, (3,), seed=0)
+        for i in range(6):
+            buffer.add(np.full(3, i), 0, float(i), np.full(3, i + 1), False)
+
+        # Only the newest transition's next state has no following transition to be read from.
+        self.assertEqual([5], list(buffer.tails))
+        states, _, _, next_states, _ = buffer.get(np.arange(6))
+        np.testing.assert_array_equal(states[:, 0] + 1, next_states[:, 0])
+
+    def test_games_are_not_chained(self):
+        buffer = memory.ReplayBuffer(10, (3,), seed=0)
+        # The second game happens to start from the observation the first one ended on.
+        buffer.add(np.full(3, 0), 0, 0.0, np.full(3, 1), True)
+        buffer.add(np.full(3, 1), 0, 1.0, np.full(3, 2), True)
+
+        self.assertEqual({0, 1}, set(buffer.tails))
+        self.assertFalse(buffer.chained[0])
+
+    def test_unchained_next_states_kept(self):
+        buffer = memory.ReplayBuffer(4, (3,), seed=0)
+        # Two games of two moves each, followed by the start of a third which overwrites the first.
+        for game in range(3):
+            for move in range(2):
+                start = 10 * game + move
+                buffer.add(np.full(3, start), 0, float(start), np.full(3, start + 1), move == 1)
+
+        states, _, rewards, next_states, _ = buffer.get(np.arange(4))
+        np.testing.assert_array_equal([20, 21, 10, 11], rewards)
+        np.testing.assert_array_equal(states[:, 0] + 1, next_states[:, 0])
+        self.assertEqual({1, 3}, set(buffer.tails))
+
+
+class SumTreeTest(unittest.TestCase):
+    def test_total_and_find(self):
+        tree = memory.SumTree(5)
+        tree.update(np.arange(5), [1, 0, 2, 3, 4])
+        self.assertEqual(10, tree.total())
+
+        np.testing.assert_array_equal([0, 0, 2, 2, 3, 3, 3, 4], tree.find([0, 0.5, 1, 2.5, 3, 5.9, 5.99, 9.9]))
+
+        tree.update([4, 0], [0, 5])
+        self.assertEqual(10, tree.total())
+        np.testing.assert_array_equal([0, 2, 3], tree.find([4.9, 5, 9.9]))
+
+
+class PrioritizedReplayBufferTest(unittest.TestCase):
+    def test_sampling_follows_priorities(self):
+        buffer = memory.PrioritizedReplayBuffer(8, (1,), seed=0, alpha=1, epsilon=0)
+        for i in range(8):
+            buffer.add([i], 0, float(i), [i], False)
+
+        buffer.update_priorities(np.arange(8), [0, 0, 0, 0, 0, 0, 1, 3])
+        indices, weights = buffer.sample_with_weights(1000)
+
+        self.assertEqual({6, 7}, set(indices))
+        self.assertAlmostEqual(0.75, np.mean(indices == 7), delta=0.05)
+        self.assertEqual(1, weights.max())
+        self.assertTrue((weights[indices == 7] < weights[indices == 6].min()).all())
+
+    def test_new_transitions_get_max_priority(self):
+        buffer = memory.PrioritizedReplayBuffer(4, (1,), seed=0, alpha=1, epsilon=0)
+        buffer.add([0], 0, 0.0, [0], False)
+        buffer.update_priorities([0], [5])
+        buffer.add([1], 0, 1.0, [1], False)
+
+        np.testing.assert_array_equal([5, 5], buffer.priorities.leaves([0, 1]))
+
+    def test_save_and_load(self):
+        buffer = memory.PrioritizedReplayBuffer(4, (1,), seed=0)
+        for i in range(3):
+            buffer.add([i], 0, float(i), [i], False)
+        buffer.update_priorities([1], [2])
+
+        with tempfile.TemporaryDirectory() as directory:
+            buffer.save(directory)
+            loaded = memory.PrioritizedReplayBuffer.load(directory)
+
+        self.assertEqual(buffer.priorities.total(), loaded.priorities.total())
+        self.assertEqual(buffer.max_priority, loaded.max_priority)
+        self.assertEqual(3, len(loaded))
+
+
+if __name__ == '__main__':
+    unittest.main()
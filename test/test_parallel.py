@@ -0,0 +1,89 @@
+import unittest
+
+import numpy as np
+
+import snake_ai.core as core
+import snake_ai.parallel as parallel
+import snake_ai.policy as policy
+
+
+def weights(seed=0):
+    rng = np.random.RandomState(seed)
+    return [rng.normal(scale=0.5, size=(8, 16)), np.zeros(16), rng.normal(scale=0.25, size=(16, 3)), np.zeros(3)]
+
+
+class Learner(policy.PolicyAgent):
+    """Counts what it is given to learn from, without learning anything."""
+
+    def __init__(self):
+        super().__init__(weights(), epsilon=0.2)
+        self.transitions = []
+        self.replays = 0
+
+    def remember(self, *transition):
+        self.transitions.append(transition)
+
+    def replay_new(self):
+        self.replays += 1
+
+
+def broken_agent(input_dim):
+    raise RuntimeError('Cannot build an agent')
+
+
+class PlayGameTest(unittest.TestCase):
+    def test_transitions_follow_each_other(self):
+        (states, actions, rewards, next_states, done), score = parallel.play_game(
+            policy.PolicyAgent(weights(), epsilon=0.5), 10, 10, core.LEFT, 100)
+
+        np.testing.assert_array_equal(states[1:], next_states[:-1])
+        np.testing.assert_array_equal([False] * (len(done) - 1) + [True], done)
+        self.assertEqual(-10, rewards[-1])
+        self.assertEqual(score, np.count_nonzero(rewards == 10))
+
+    def test_seeded_games_repeat(self):
+        games = []
+        for _ in range(2):
+            np.random.seed(0)
+            games.append(parallel.play_game(policy.PolicyAgent(weights(), epsilon=0.5), 10, 10, core.LEFT, 100, seed=5))
+
+        for first, second in zip(*(transitions for transitions, _ in games)):
+            np.testing.assert_array_equal(first, second)
+
+
+class TrainTest(unittest.TestCase):
+    def test_trains_on_games_from_workers(self):
+        learner = Learner()
+        high_score = parallel.train(learner, (8,), 2, 4, 10, 10, core.LEFT, 100, seed=0)
+
+        self.assertEqual(4, learner.replays)
+        # Every game ends with exactly one transition marked done.
+        self.assertEqual(4, sum(bool(transition[4]) for transition in learner.transitions))
+        self.assertLessEqual(0, high_score)
+
+    def test_reports_every_game(self):
+        learner = Learner()
+        games = []
+        high_score = parallel.train(learner, (8,), 2, 3, 10, 10, core.LEFT, 100, seed=0, first_game=5,
+                                    on_game=lambda *game: games.append(game))
+
+        self.assertEqual([5, 6, 7], [number for number, _, _ in games])
+        self.assertEqual(high_score, max(score for _, score, _ in games))
+        self.assertEqual(len(learner.transitions), sum(steps for _, _, steps in games))
+
+    def test_games_follow_the_seed(self):
+        runs = []
+        for _ in range(2):
+            learner = Learner()
+            parallel.train(learner, (8,), 1, 3, 10, 10, core.LEFT, 100, seed=3)
+            runs.append([np.concatenate([np.ravel(part) for part in transition]) for transition in learner.transitions])
+
+        np.testing.assert_array_equal(runs[0], runs[1])
+
+    def test_failed_worker_raises(self):
+        with self.assertRaises(RuntimeError):
+            parallel.train(Learner(), (8,), 2, 4, 10, 10, core.LEFT, 100, make_agent=broken_agent, seed=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import snake_ai.policy as policy
+
+
+def random_weights(rng, sizes):
+    weights = []
+    for n_in, n_out in zip(sizes, sizes[1:]):
+        weights.append(rng.normal(scale=np.sqrt(1 / n_in), size=(n_in, n_out)))
+        weights.append(rng.normal(scale=0.1, size=n_out))
+    return weights
+
+
+def reference_predict(weights, states):
+    x = np.asarray(states, dtype=np.float64)
+    for i in range(0, len(weights), 2):
+        x = x @ weights[i] + weights[i + 1]
+        if i < len(weights) - 2:
+            x = np.maximum(x, 0)
+    e = np.exp(x - x.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class NumpyPolicyTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        self.weights = random_weights(rng, [8, 120, 120, 120, 3])
+        self.states = rng.randint(2, size=(200, 8))
+
+    def test_matches_reference_forward_pass(self):
+        net = policy.NumpyPolicy(self.weights)
+        expected = reference_predict(self.weights, self.states)
+
+        np.testing.assert_allclose(expected, net.predict(self.states), rtol=1e-4, atol=1e-6)
+        np.testing.assert_array_equal(np.argmax(expected, axis=1), net.act(self.states))
+
+    def test_single_state_shapes(self):
+        net = policy.NumpyPolicy(self.weights)
+        state = self.states[0].reshape((1, -1))
+
+        self.assertEqual((1, 3), net.predict(state).shape)
+        self.assertEqual(np.float32, net.predict(state).dtype)
+        self.assertEqual((1,), net.act(state).shape)
+
+    def test_weights_are_copied(self):
+        net = policy.NumpyPolicy(self.weights)
+        before = net.act(self.states)
+        self.weights[-1][:] = [100, 0, 0]
+
+        np.testing.assert_array_equal(before, net.act(self.states))
+        net.set_weights(self.weights)
+        self.assertTrue(np.all(net.act(self.states) == 0))
+
+    def test_blend_moves_towards_weights(self):
+        net = policy.NumpyPolicy([np.zeros((2, 2)), np.zeros(2)])
+        net.blend([np.ones((2, 2)), np.full(2, 4)], 0.25)
+
+        np.testing.assert_allclose(np.full((2, 2), 0.25), net.get_weights()[0])
+        np.testing.assert_allclose(np.full(2, 1.0), net.get_weights()[1])
+
+        net.blend([np.ones((2, 2)), np.full(2, 4)], 1)
+        np.testing.assert_allclose(np.ones((2, 2)), net.get_weights()[0])
+
+    def test_npz_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'weights.npz')
+            policy.save_weights(path, self.weights)
+            loaded = policy.load_weights(path)
+
+        self.assertEqual(len(self.weights), len(loaded))
+        for expected, actual in zip(self.weights, loaded):
+            np.testing.assert_array_equal(expected, actual)
+        np.testing.assert_array_equal(policy.NumpyPolicy(self.weights).act(self.states),
+                                      policy.NumpyPolicy(loaded).act(self.states))
+
+    def test_rejects_unpaired_weights(self):
+        with self.assertRaises(ValueError):
+            policy.NumpyPolicy(self.weights[:-1])
+
+
+class PolicyAgentTest(unittest.TestCase):
+    def test_greedy_moves_follow_policy(self):
+        weights = random_weights(np.random.RandomState(5), [8, 16, 3])
+        agent = policy.PolicyAgent(weights, epsilon=0)
+        states = np.random.RandomState(6).randint(2, size=(20, 8))
+        expected = policy.NumpyPolicy(weights).act(states)
+
+        for state, action in zip(states, expected):
+            self.assertEqual(action, agent.make_choice(state.reshape((1, -1))))
+
+    def test_batched_choices(self):
+        weights = random_weights(np.random.RandomState(5), [8, 16, 3])
+        states = np.random.RandomState(6).randint(2, size=(50, 1, 8))
+        expected = policy.NumpyPolicy(weights).act(states)
+
+        np.testing.assert_array_equal(expected, policy.PolicyAgent(weights, epsilon=0).make_choices(states))
+
+    def test_batched_exploration(self):
+        np.random.seed(7)
+        states = np.zeros((1000, 8))
+        # With every row exploring the policy is never evaluated, so it needs no weights.
+        choices = policy.epsilon_greedy(policy.NumpyPolicy(), states, epsilon=1)
+
+        self.assertEqual((1000,), choices.shape)
+        self.assertEqual({0, 1, 2}, set(choices))
+
+    def test_partial_exploration_keeps_greedy_rows(self):
+        np.random.seed(8)
+        weights = random_weights(np.random.RandomState(5), [8, 16, 3])
+        weights[-1][:] = [0, 0, 100]
+        choices = policy.epsilon_greedy(policy.NumpyPolicy(weights), np.zeros((1000, 8)), epsilon=0.3)
+
+        # Greedy rows pick 2, as do a third of the exploring ones.
+        self.assertAlmostEqual(0.8, np.mean(choices == 2), delta=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
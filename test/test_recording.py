@@ -0,0 +1,205 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import snake_ai.core as core
+import snake_ai.recording as recording
+
+
+def play(recorder, seed, moves, legacy_rng=False):
+    snake = core.Snake(np.array([5, 5]), 3, core.LEFT)
+    state = core.GameState(snake, 10, 10, seed=seed, legacy_rng=legacy_rng, recorder=recorder)
+    history = []
+    for move in moves:
+        if not state.is_playable():
+            break
+        state.update(move)
+        history.append(([part.pos.tolist() for part in state.snake], [food.pos.tolist() for food in state.food_items],
+                        state.get_score()))
+    return state, history
+
+
+def replayed(record):
+    history = []
+    states = record.play()
+    next(states)
+    for state in states:
+        history.append(([part.pos.tolist() for part in state.snake], [food.pos.tolist() for food in state.food_items],
+                        state.get_score()))
+    return state, history
+
+
+class RecordingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games.rec')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_replays_match_original_games(self):
+        rng = np.random.RandomState(0)
+        games = []
+        with recording.GameRecorder(self.path, flush_moves=16) as recorder:
+            for seed, legacy_rng in [(1, False), (2, True), (3, False)]:
+                moves = [core.DIRECTIONS[i] for i in rng.randint(4, size=200)]
+                games.append(play(recorder, seed, moves, legacy_rng))
+
+        records = list(recording.read_games(self.path))
+        self.assertEqual(len(games), len(records))
+        for (state, history), record in zip(games, records):
+            replay_state, replay_history = replayed(record)
+            self.assertEqual(history, replay_history)
+            self.assertEqual(state.get_score(), record.score)
+            self.assertEqual(len(history), record.turns)
+            self.assertEqual(state.is_playable(), record.playable)
+
+    def test_food_set_by_hand(self):
+        with recording.GameRecorder(self.path) as recorder:
+            state, history = play(recorder, 4, [core.LEFT])
+            state.set_food([core._food_item(np.array([2, 5]), 1)])
+            for move in [core.LEFT, core.LEFT, core.UP]:
+                state.update(move)
+                history.append(([part.pos.tolist() for part in state.snake],
+                                [food.pos.tolist() for food in state.food_items], state.get_score()))
+
+        record, = recording.read_games(self.path)
+        self.assertEqual(1, len(record.food_events))
+        self.assertEqual(history, replayed(record)[1])
+        self.assertEqual(1, record.score)
+        # The game was still being played when the recorder was closed.
+        self.assertTrue(record.playable)
+
+    def test_moves_take_two_bits(self):
+        sizes = []
+        for n in (0, 4000):
+            path = os.path.join(self.directory.name, '%d.rec' % n)
+            with recording.GameRecorder(path) as recorder:
+                snake = core.Snake(np.array([5, 5]), 3, core.LEFT)
+                recorder.begin(core.GameState(snake, 10, 10, seed=5))
+                for i in range(n):
+                    recorder.move(i % 4)
+            sizes.append(os.path.getsize(path))
+
+        self.assertLessEqual(sizes[1] - sizes[0], 4000 // 4 + 4)
+        record, = recording.read_games(path)
+        np.testing.assert_array_equal(np.arange(4000) % 4, record.moves)
+
+    def test_top_games(self):
+        with recording.GameRecorder(self.path) as recorder:
+            for seed in range(6):
+                state, _ = play(recorder, seed, [core.LEFT])
+                state.score = seed * 7 % 5
+                recorder.end(state)
+
+        scores = [record.score for record in recording.read_games(self.path, moves=False)]
+        top = recording.top_games(self.path, 2)
+        self.assertEqual(sorted(scores, reverse=True)[:2], [record.score for record in top])
+        self.assertEqual(1, len(top[0].moves))
+
+    def test_appends_to_existing_recording(self):
+        for seed in (1, 2):
+            with recording.GameRecorder(self.path) as recorder:
+                play(recorder, seed, [core.UP] * 20)
+
+        self.assertEqual([1, 2], [record.seed for record in recording.read_games(self.path)])
+
+    def _interrupt(self):
+        """Record a finished game followed by one the process is stopped part way through.
+
+        :returns the offset of the unfinished game."""
+        recorder = recording.GameRecorder(self.path)
+        play(recorder, 1, [core.UP] * 20)
+        offset = os.path.getsize(self.path)
+        play(recorder, 2, [core.LEFT, core.UP])
+        recorder._flush_moves()
+        recorder._file.close()
+        return offset
+
+    def test_unfinished_game_skipped(self):
+        offset = self._interrupt()
+        self.assertEqual([1], [record.seed for record in recording.read_games(self.path)])
+        self.assertEqual([1], [record.seed for record in recording.top_games(self.path, 2)])
+        with self.assertRaises(recording.TruncatedGame):
+            recording.read_game(self.path, offset)
+
+    def test_appending_cuts_off_unfinished_game(self):
+        self._interrupt()
+        with recording.GameRecorder(self.path) as recorder:
+            play(recorder, 3, [core.UP] * 20)
+
+        self.assertEqual([1, 3], [record.seed for record in recording.read_games(self.path)])
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a recording')
+
+        with self.assertRaises(ValueError):
+            recording.GameRecorder(self.path)
+        with self.assertRaises(ValueError):
+            list(recording.read_games(self.path))
+
+
+def snapshot(state):
+    return ([part.pos.tolist() for part in state.snake], [food.pos.tolist() for food in state.food_items],
+            state.get_score(), state.is_playable())
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        # Circle clockwise around a 4 x 4 square, which never ends the game.
+        self.moves = []
+        for i in range(300):
+            self.moves += [1] * 3 + [2] * 3 + [3] * 3 + [0] * 3
+        snake = core.Snake(np.array([3, 3]), 2, core.RIGHT)
+        self.initial = core.GameState(snake, 20, 20, seed=9)
+
+        state = self.initial.copy()
+        self.expected = [snapshot(state)]
+        for move in self.moves:
+            state.update(move)
+            self.expected.append(snapshot(state))
+
+    def test_seeking_matches_playing_forward(self):
+        replay = recording.Replay(self.initial, self.moves, snapshot_every=100)
+
+        for index in [0, 250, 3600, 10, 1234, 1234, 1235, 0, 3599, 5000, -4]:
+            state = replay.seek(index)
+            clamped = max(0, min(index, len(self.moves)))
+            self.assertEqual(self.expected[clamped], snapshot(state))
+            self.assertEqual(clamped, replay.position)
+
+        self.assertEqual(self.expected[0], snapshot(self.initial))
+
+    def test_seeking_back_starts_from_nearest_snapshot(self):
+        replay = recording.Replay(self.initial, self.moves, snapshot_every=100)
+        replay.seek(len(self.moves))
+        self.assertEqual(set(range(0, len(self.moves) + 1, 100)), set(replay.snapshots))
+
+        updates = []
+        with mock.patch.object(replay, 'step', wraps=replay.step) as step:
+            replay.seek(1299)
+            updates.append(step.call_count)
+        self.assertEqual([99], updates)
+
+    def test_record_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'games.rec')
+            with recording.GameRecorder(path) as recorder:
+                state = self.initial.copy()
+                recorder.begin(state)
+                state.recorder = recorder
+                for move in self.moves:
+                    state.update(move)
+
+            record, = recording.read_games(path)
+
+        replay = record.replay(snapshot_every=64)
+        self.assertEqual(self.expected[777], snapshot(replay.seek(777)))
+
+
+if __name__ == '__main__':
+    unittest.main()
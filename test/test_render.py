@@ -0,0 +1,139 @@
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+import snake_ai.core as core
+import snake_ai.render as render
+
+
+class Screen:
+    """Stands in for a curses window, keeping the characters written to it."""
+
+    def __init__(self):
+        self.cells = {}
+        self.writes = []
+        self.refreshes = 0
+
+    def addstr(self, y, x, text):
+        self.writes.append((y, x, text))
+        for i, c in enumerate(text):
+            self.cells[(y, x + i)] = c
+
+    def clear(self):
+        self.cells = {}
+
+    def refresh(self):
+        self.refreshes += 1
+
+    def keypad(self, value):
+        pass
+
+    def row(self, y, width):
+        return ''.join(self.cells.get((y, x), ' ') for x in range(width))
+
+
+class TerminalRendererTest(unittest.TestCase):
+    def setUp(self):
+        self.screen = Screen()
+        patcher = mock.patch.multiple('curses', initscr=mock.Mock(return_value=self.screen), noecho=mock.DEFAULT,
+                                      cbreak=mock.DEFAULT)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_draws_whole_non_square_board(self):
+        snake = core.Snake(np.array([3, 6]), 2, core.UP)
+        state = core.GameState(snake, 8, 5, seed=1)
+        food = state.food()[0].pos
+        renderer = render.TerminalRenderer()
+        renderer.render(state)
+
+        self.assertEqual('+----+', self.screen.row(0, 6))
+        self.assertEqual('+----+', self.screen.row(8, 6))
+        for y in range(1, 8):
+            row = self.screen.row(y, 6)
+            self.assertEqual('|', row[0])
+            self.assertEqual('|', row[5])
+        self.assertEqual('o', self.screen.cells[(6, 3)])
+        self.assertEqual('o', self.screen.cells[(7, 3)])
+        self.assertEqual('x', self.screen.cells[(food[1], food[0])])
+        self.assertEqual(1, self.screen.refreshes)
+
+    def test_only_changes_are_written(self):
+        snake = core.Snake(np.array([5, 5]), 3, core.LEFT)
+        state = core.GameState(snake, 20, 20, seed=2)
+        renderer = render.TerminalRenderer()
+        renderer.render(state)
+
+        self.screen.writes = []
+        state.update(core.LEFT)
+        renderer.render(state)
+
+        board = [text for y, x, text in self.screen.writes if x <= 20]
+        # The head and the tail move along the same row, and a single line of debugging text changes.
+        self.assertEqual(1, len(board))
+        self.assertEqual('ooo ', board[0])
+        self.assertEqual(1, len(self.screen.writes) - len(board))
+
+        expected = render.TerminalRenderer._build_frame(state)
+        for y, row in enumerate(expected):
+            self.assertEqual(''.join(row), self.screen.row(y, 21))
+
+        self.screen.writes = []
+        renderer.render(state)
+        self.assertEqual([], self.screen.writes)
+        self.assertEqual(3, self.screen.refreshes)
+
+    def test_frame_rate_cap_drops_frames_until_game_over(self):
+        snake = core.Snake(np.array([2, 5]), 1, core.LEFT)
+        state = core.GameState(snake, 10, 10, seed=3)
+        renderer = render.TerminalRenderer(max_fps=1e-3)
+
+        self.assertTrue(renderer.render(state))
+        state.update(core.LEFT)
+        self.assertFalse(renderer.render(state))
+        state.update(core.LEFT)
+        self.assertFalse(state.is_playable())
+        self.assertTrue(renderer.render(state))
+        self.assertEqual('o', self.screen.cells[(5, 0)])
+
+
+@unittest.skipIf(pygame is None, 'pygame is not installed')
+class PygameRendererTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, SDL_VIDEODRIVER='dummy')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_changes_match_whole_frames(self):
+        renderer = render.PygameRenderer(12, 10, 8)
+        self.addCleanup(renderer.close)
+        rng = np.random.RandomState(4)
+        state = None
+        frames = 0
+
+        while frames < 300:
+            if state is None or not state.is_playable():
+                state = core.GameState(core.Snake(np.array([5, 6]), 3, core.LEFT), 12, 10, seed=frames)
+            elif rng.rand() < 0.2:
+                state.update(core.DIRECTIONS[rng.randint(4)])
+            else:
+                # Head for the food so that eating and growing are drawn as well as dying.
+                dx, dy = state.food()[0].pos - state.snake.head().pos
+                state.update(np.array([np.sign(dx), 0]) if dx else np.array([0, np.sign(dy)]))
+
+            renderer.render(state)
+            drawn = pygame.surfarray.array3d(renderer.window)
+            renderer._draw_all(state)
+            np.testing.assert_array_equal(pygame.surfarray.array3d(renderer.window), drawn)
+            frames += 1
+
+
+if __name__ == '__main__':
+    unittest.main()
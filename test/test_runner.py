@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+import snake_ai.core as core
+import snake_ai.runner as runner
+
+
+class Renderer:
+    """Keeps the position of the head and the score of every frame it is asked to draw."""
+
+    def __init__(self):
+        self.frames = []
+
+    def render(self, game_state):
+        self.frames.append((tuple(game_state.snake.head().pos), game_state.get_score()))
+
+
+class Controls:
+    """Gives out scripted events, one every `delay` seconds, then waits forever."""
+
+    def __init__(self, events, delay=0.0):
+        self.events = list(events)
+        self.delay = delay
+
+    async def next_event(self):
+        if not self.events:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        return self.events.pop(0)
+
+
+def new_state():
+    return core.GameState(core.Snake(np.array([5, 5]), 1, core.LEFT), 10, 10, seed=1)
+
+
+class GameRunnerTest(unittest.TestCase):
+    def test_play_draws_once_per_move(self):
+        renderer = Renderer()
+        state = new_state()
+
+        async def play():
+            async with runner.GameRunner(renderer, Controls([]), 500) as game:
+                return await game.play(state, core.LEFT)
+
+        self.assertTrue(asyncio.run(play()))
+        self.assertFalse(state.is_playable())
+        # The starting position is drawn, followed by one frame per move until the snake leaves the board.
+        self.assertEqual([(x, 5) for x in range(5, -1, -1)], [head for head, _ in renderer.frames])
+
+    def test_steering(self):
+        renderer = Renderer()
+        state = new_state()
+
+        async def play():
+            async with runner.GameRunner(renderer, Controls([core.UP]), 500) as game:
+                await game.play(state, core.LEFT)
+
+        asyncio.run(play())
+        self.assertEqual(0, renderer.frames[-1][0][1])
+
+    def test_quit_stops_game(self):
+        renderer = Renderer()
+        state = new_state()
+
+        async def play():
+            async with runner.GameRunner(renderer, Controls([runner.QUIT], delay=0.05), 1) as game:
+                finished = await game.play(state, core.LEFT)
+                return finished, game.quit
+
+        self.assertEqual((False, True), asyncio.run(play()))
+        self.assertTrue(state.is_playable())
+        self.assertEqual(1, len(renderer.frames))
+
+    def test_watch_replays_moves(self):
+        renderer = Renderer()
+        state = new_state()
+        moves = [core.direction_index(core.UP)] * 3 + [core.direction_index(core.RIGHT)] * 2
+        expected = state.copy()
+        for move in moves:
+            expected.update(move)
+
+        async def watch():
+            async with runner.GameRunner(renderer, Controls([]), 500) as game:
+                return await game.watch(state, moves)
+
+        self.assertTrue(asyncio.run(watch()))
+        self.assertEqual(len(moves) + 1, len(renderer.frames))
+        self.assertEqual((tuple(expected.snake.head().pos), expected.get_score()), renderer.frames[-1])
+        self.assertEqual((5, 5), tuple(state.snake.head().pos))
+
+
+class ViewerTest(unittest.TestCase):
+    def test_shows_games_offered_during_work(self):
+        renderer = Renderer()
+        viewer = runner.Viewer(runner.GameRunner(renderer, Controls([]), 1000))
+        moves = [core.direction_index(core.UP)] * 4
+
+        async def work():
+            time_slice = runner.TimeSlice(0)
+            viewer.offer(new_state(), moves)
+            for _ in range(10):
+                await time_slice.pause()
+            return 'done'
+
+        self.assertEqual('done', asyncio.run(viewer.alongside(work())))
+        # The game is played out after the work finishes.
+        self.assertEqual([(5, y) for y in range(5, 0, -1)], [head for head, _ in renderer.frames])
+
+    def test_latest_offer_replaces_waiting_game(self):
+        renderer = Renderer()
+        viewer = runner.Viewer(runner.GameRunner(renderer, Controls([]), 1000))
+
+        async def work():
+            viewer.offer(new_state(), [core.direction_index(core.UP)])
+            viewer.offer(new_state(), [core.direction_index(core.DOWN)])
+
+        asyncio.run(viewer.alongside(work()))
+        self.assertEqual([(5, 5), (5, 6)], [head for head, _ in renderer.frames])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import contextlib
+import io
 import unittest
 import numpy as np
 import snake_ai.trainer as trainer
@@ -8,7 +10,7 @@ class TrainerTest(unittest.TestCase):
     def test_rewards_eating(self):
         # Recall the 10 seed from test_core.
         snake = core.Snake(np.array([5, 5]), 2, core.LEFT)
-        state = core.GameState(snake, 10, 10, seed=10)
+        state = core.GameState(snake, 10, 10, seed=10, legacy_rng=True)
 
         has_eaten = False
 
@@ -32,7 +34,7 @@ class TrainerTest(unittest.TestCase):
 
     def test_not_eating_gives_negative_distance(self):
         snake = core.Snake(np.array([5, 5]), 2, core.LEFT)
-        state = core.GameState(snake, 10, 10, seed=10)
+        state = core.GameState(snake, 10, 10, seed=10, legacy_rng=True)
 
         old_state = state.to_matrix()
         state.update(core.UP)
@@ -84,3 +86,9 @@ class TrainerTest(unittest.TestCase):
 
     def test_move_conversion_oob(self):
         self.assertIsNone(trainer.to_move(3, core.UP))
+
+    def test_workers_reject_in_process_options(self):
+        self.assertEqual(2, trainer.parse_args(['--workers', '2', '--checkpoint-every', '5']).workers)
+        for option in (['--record', 'games.rec'], ['--profile-games', '3']):
+            with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                trainer.parse_args(['--workers', '2'] + option)